@@ -4,15 +4,101 @@
 import os
 import shutil
 import subprocess
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime
-from multiprocessing import Pool
+from typing import List, Optional
 
 import click
 
+from .adaptive import DEFAULT_MIN_TRIALS, DEFAULT_RATE_WIDTH, AdaptiveStopper
 from .benchmarks import BENCHMARKS
 from .bm_configs.benchmark_base import SavedBenchmark
+from .builder import build_all, remove_stamp, write_stamp
+from .cds import CDS_TOOLS, classpath_digest, dump_archive, job_classpaths
+from .collector import collect_tests, write_full_list
 from .commons import FRAY_PATH, OUTPUT_PATH, SCHEDULERS, RR_PATH, JPF_PATH
-from .utils import run_fray, run_rr, run_jpf, run_stats_collector
+from .distributed import TOKEN_ENV, Coordinator, parse_address, run_worker
+from .history import RuntimeHistory
+from .ledger import JobLedger
+from .objects.campaign import Campaign
+from .objects.job import Job
+from .scheduler import EXECUTORS, TOOLS, campaign_jobs, generate_jobs, iteration_dir, run_jobs, total_memory, trial_groups
+from .slots import SlotAllocator
+
+
+def pinning_options(f):
+    f = click.option("--numa", type=bool, is_flag=True, show_default=True, default=False,
+                     help="Keep the cores of each pinned job on a single NUMA node.")(f)
+    f = click.option("--cores-per-job", type=int, default=1, show_default=True,
+                     help="Number of cores pinned to each job.")(f)
+    f = click.option("--pin", type=bool, is_flag=True, show_default=True, default=False,
+                     help="Pin every concurrent job to its own set of cores with taskset.")(f)
+    return f
+
+
+def memory_option(f):
+    return click.option("--memory", type=int, default=None,
+                        help="Memory in MB shared by all concurrent jobs; 0 uses the available system memory. "
+                             "Jobs only start when their memory budget fits.")(f)
+
+
+def resolve_memory_limit(memory: Optional[int]) -> Optional[int]:
+    if memory == 0:
+        return total_memory()
+    return memory
+
+
+def shared_token() -> str:
+    token = os.environ.get(TOKEN_ENV)
+    if not token:
+        raise click.UsageError(f"Set {TOKEN_ENV} to a secret shared by the coordinator and its workers.")
+    return token
+
+
+def coordinator_option(f):
+    return click.option("--coordinator", type=str, default=None, metavar="HOST:PORT",
+                        help="Serve jobs to remote `worker` processes on this address instead of running them locally.")(f)
+
+
+def executor_option(f):
+    return click.option("--executor", type=click.Choice(list(EXECUTORS.keys())), default="pool", show_default=True,
+                        help="Run local jobs on a process pool or from a single asyncio event loop.")(f)
+
+
+def adaptive_options(f):
+    f = click.option("--ci-width", type=float, default=DEFAULT_RATE_WIDTH, show_default=True,
+                     help="Width of the 95% detection-rate interval at which a test has converged.")(f)
+    f = click.option("--min-trials", type=int, default=DEFAULT_MIN_TRIALS, show_default=True,
+                     help="Trials every test runs before it may converge.")(f)
+    f = click.option("--adaptive", type=bool, is_flag=True, show_default=True, default=False,
+                     help="Stop scheduling trials of a test once its detection rate and time to bug have converged.")(f)
+    return f
+
+
+def create_stopper(adaptive: bool, min_trials: int, ci_width: float) -> Optional[AdaptiveStopper]:
+    return AdaptiveStopper(min_trials, ci_width) if adaptive else None
+
+
+def cds_option(f):
+    return click.option("--cds", type=bool, is_flag=True, show_default=True, default=False,
+                        help="Start JVMs with the benchmark's AppCDS archive created by the `cds` command.")(f)
+
+
+@contextmanager
+def create_executor(coordinator: Optional[str], executor_name: str = "pool", cpu: int = 1):
+    if coordinator is not None:
+        executor = Coordinator(parse_address(coordinator), shared_token())
+    elif executor_name != "pool":
+        executor = EXECUTORS[executor_name](cpu)
+    else:
+        # run_jobs creates a pool per call.
+        yield None
+        return
+    try:
+        yield executor
+    finally:
+        executor.close()
 
 
 @click.group(name="mode")
@@ -21,22 +107,64 @@ def main():
 
 @main.command(name="collector")
 @click.argument("application", type=click.Choice(list(BENCHMARKS.keys())))
-def collector(application: str):
+@click.option("--shards", type=int, default=4, show_default=True,
+              help="Number of JVMs that run the scanned test classes in parallel.")
+def collector(application: str, shards: int):
     app = BENCHMARKS[application]
-    command = app.generate_collector_command()
-    print(" ".join(command))
-    subprocess.call(command, cwd=FRAY_PATH)
+    write_full_list(application, collect_tests(app, max(1, shards)))
 
 
 @main.command(name="build")
+@click.argument("application", type=click.Choice(list(BENCHMARKS.keys())), required=False)
+@click.option("--all", "build_every", type=bool, is_flag=True, default=False,
+              help="Build every benchmark whose sources changed since its last build.")
+@click.option("--cpu", type=int, default=len(os.sched_getaffinity(0)), show_default=True,
+              help="Cores shared by the builds of --all.")
+@click.option("--parallel", type=int, default=3, show_default=True,
+              help="Number of benchmarks --all builds at the same time.")
+@click.option("--force", type=bool, is_flag=True, default=False,
+              help="Rebuild benchmarks that are up to date.")
+def build(application: Optional[str], build_every: bool, cpu: int, parallel: int, force: bool):
+    if build_every:
+        names = [application] if application is not None else list(BENCHMARKS.keys())
+        if not build_all(names, cpu, parallel, force):
+            raise click.ClickException("Some builds failed, see output/build-logs")
+        return
+    if application is None:
+        raise click.BadParameter("Pass an application or --all", param_hint="application")
+    app = BENCHMARKS[application]
+    # A failed build must not leave an earlier stamp behind.
+    remove_stamp(app)
+    try:
+        app.build()
+    except (OSError, subprocess.CalledProcessError, RuntimeError) as error:
+        raise click.ClickException(f"Building {application} failed: {error}")
+    write_stamp(app)
+
+
+@main.command(name="cds")
 @click.argument("application", type=click.Choice(list(BENCHMARKS.keys())))
-def build(application: str):
+@click.option("--tool", "tools", type=click.Choice(CDS_TOOLS), multiple=True, default=CDS_TOOLS, show_default=True)
+@click.option("--scheduler", type=click.Choice(list(SCHEDULERS.keys())), default="random", show_default=True)
+@click.option("--timeout", "-t", type=int, default=60 * 10)
+def cds(application: str, tools: List[str], scheduler: str, timeout: int):
+    # An archive is recorded from the first test of every distinct
+    # classpath; the framework and dependency classes it loads are shared by
+    # the tests on that classpath.
     app = BENCHMARKS[application]
-    app.build()
+    with tempfile.TemporaryDirectory() as out_dir:
+        for tool in tools:
+            jobs = {}
+            for job in generate_jobs(app, tool, scheduler, os.path.join(out_dir, tool), timeout, False):
+                jobs.setdefault(classpath_digest(job_classpaths(job)), job)
+            if not jobs:
+                print(f"{application} has no tests for {tool}")
+            for job in jobs.values():
+                dump_archive(app, job)
 
 
 @main.command(name="run")
-@click.argument("tool", type=click.Choice(["jpf", "rr", "fray", "stat", "java"]))
+@click.argument("tool", type=click.Choice(TOOLS))
 @click.argument("application", type=click.Choice(list(BENCHMARKS.keys())))
 @click.option("--scheduler", type=click.Choice(list(SCHEDULERS.keys())))
 @click.option("--name", type=str, default=datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
@@ -44,29 +172,86 @@ def build(application: str):
 @click.option("--cpu", type=int, default=6)
 @click.option("--perf-mode", type=bool, is_flag=True, show_default=True, default=False)
 @click.option("--iterations", type=int, default=20)
-def run(tool: str, application: str, scheduler: str, name: str, timeout: int, cpu: int, iterations: int, perf_mode: bool):
+@click.option("--persistent-pool", type=bool, is_flag=True, show_default=True, default=False,
+              help="Run all iterations on one worker pool instead of one pool per iteration.")
+@click.option("--batch-size", type=int, default=1, show_default=True,
+              help="Number of JUnit tests run one after another in a single JVM.")
+@click.option("--trials-per-process", type=int, default=1, show_default=True,
+              help="Number of iterations (trials) of a test one Fray process runs back to back.")
+@pinning_options
+@memory_option
+@coordinator_option
+@executor_option
+@adaptive_options
+@cds_option
+def run(tool: str, application: str, scheduler: str, name: str, timeout: int, cpu: int, iterations: int, perf_mode: bool,
+        persistent_pool: bool, batch_size: int, trials_per_process: int, pin: bool, cores_per_job: int, numa: bool, memory: Optional[int], coordinator: Optional[str],
+        executor: str, adaptive: bool, min_trials: int, ci_width: float, cds: bool):
     app = BENCHMARKS[application]
-    for i in range(iterations):
-        out_dir = os.path.join(OUTPUT_PATH, name, app.name, scheduler if tool == "fray" else tool, f"iter-{i}")
-        # if os.path.exists(out_dir):
-        #     shutil.rmtree(out_dir)
-        os.makedirs(out_dir, exist_ok=True)
-        with Pool(processes=cpu) as pool:
-            if tool == "java":
-                pool.starmap(run_fray, map(lambda it: (*it, timeout),
-                            app.generate_java_test_commands(SCHEDULERS["random"], out_dir, timeout, perf_mode)))
-            elif tool == "rr":
-                pool.starmap(run_rr, map(lambda it: (*it, timeout),
-                            app.generate_rr_test_commands(out_dir, timeout, perf_mode)))
-            elif tool == "jpf":
-                pool.starmap(run_jpf, map(lambda it: (*it, timeout),
-                            app.generate_jpf_test_commands(out_dir, timeout, perf_mode)))
-            elif tool == "stat":
-                pool.starmap(run_stats_collector, map(lambda it: (*it, timeout),
-                            app.generate_fray_stats_collector_commands(out_dir)))
-            else:
-                pool.starmap(run_fray, map(lambda it: (
-                    *it, timeout), app.generate_fray_test_commands(SCHEDULERS[scheduler], out_dir, timeout, perf_mode)))
+    # With a coordinator, jobs are pinned by the workers.
+    slots = SlotAllocator(cpu, cores_per_job, numa) if pin and coordinator is None else None
+    memory_limit = resolve_memory_limit(memory)
+    stopper = create_stopper(adaptive, min_trials, ci_width)
+    with JobLedger(os.path.join(OUTPUT_PATH, name)) as ledger, \
+            create_executor(coordinator, executor, cpu) as job_executor:
+        # The adaptive mode hands the CPU time of converged tests to the
+        # others, which needs all trials in one queue.
+        if persistent_pool or adaptive:
+            jobs = []
+            for i, trials in trial_groups(tool, iterations, trials_per_process):
+                out_dir = iteration_dir(name, app, tool, scheduler, i)
+                jobs.extend(generate_jobs(app, tool, scheduler, out_dir, timeout, perf_mode, cds, batch_size, trials))
+            run_jobs(jobs, cpu, slots, memory_limit, ledger, job_executor, stopper)
+        else:
+            for i, trials in trial_groups(tool, iterations, trials_per_process):
+                out_dir = iteration_dir(name, app, tool, scheduler, i)
+                run_jobs(generate_jobs(app, tool, scheduler, out_dir, timeout, perf_mode, cds, batch_size, trials), cpu, slots,
+                         memory_limit, ledger, job_executor)
+
+
+@main.command(name="campaign")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--name", type=str, default=None, help="Override the experiment name from the campaign file.")
+@click.option("--cpu", type=int, default=6)
+@pinning_options
+@memory_option
+@coordinator_option
+@executor_option
+@adaptive_options
+@cds_option
+def campaign(path: str, name: str, cpu: int, pin: bool, cores_per_job: int, numa: bool, memory: Optional[int],
+             coordinator: Optional[str], executor: str, adaptive: bool, min_trials: int, ci_width: float, cds: bool):
+    with open(path) as f:
+        config = Campaign.from_json(f.read())
+    if name is not None:
+        config.name = name
+    for entry in config.runs:
+        for tool in entry.tools:
+            if tool not in TOOLS:
+                raise click.BadParameter(f"Unknown tool: {tool}", param_hint="path")
+        if "fray" in entry.tools and not entry.schedulers:
+            raise click.BadParameter("A run with the fray tool needs at least one scheduler", param_hint="path")
+        for application in entry.applications:
+            if application not in BENCHMARKS:
+                raise click.BadParameter(f"Unknown application: {application}", param_hint="path")
+        for scheduler in entry.schedulers:
+            if scheduler not in SCHEDULERS:
+                raise click.BadParameter(f"Unknown scheduler: {scheduler}", param_hint="path")
+    # With a coordinator, jobs are pinned by the workers.
+    slots = SlotAllocator(cpu, cores_per_job, numa) if pin and coordinator is None else None
+    with JobLedger(os.path.join(OUTPUT_PATH, config.name)) as ledger, \
+            create_executor(coordinator, executor, cpu) as job_executor:
+        run_jobs(campaign_jobs(config, BENCHMARKS, cds), cpu, slots, resolve_memory_limit(memory), ledger, job_executor,
+                 create_stopper(adaptive, min_trials, ci_width))
+
+
+@main.command(name="history")
+@click.argument("path", type=str, default=OUTPUT_PATH)
+def history(path: str):
+    runtime_history = RuntimeHistory()
+    count = runtime_history.ingest(os.path.abspath(path))
+    runtime_history.save()
+    print(f"Recorded {count} runs from {path} into {runtime_history.path}")
 
 
 @main.command(name="runOne")
@@ -76,30 +261,30 @@ def run(tool: str, application: str, scheduler: str, name: str, timeout: int, cp
 @click.argument("index", type=str)
 @click.option("--timeout", "-t", type=int, default=10 * 60)
 @click.option("--iterations", type=int, default=20)
-def run_one(experiment: str, application: str, tool: str, index: str, timeout: int, iterations: int):
+@coordinator_option
+def run_one(experiment: str, application: str, tool: str, index: str, timeout: int, iterations: int,
+            coordinator: Optional[str]):
     cpu = os.cpu_count()
-    run_configs = []
+    runner = tool if tool in ["java", "rr", "jpf"] else "fray"
+    cwd = {"rr": RR_PATH, "jpf": JPF_PATH}.get(tool, FRAY_PATH)
+    jobs = []
     for i in range(iterations):
         out_dir = os.path.join(OUTPUT_PATH, experiment, application, tool, f"iter-{i}", index)
         saved = SavedBenchmark(out_dir, i)
-        run_configs.append(saved)
-
-    with Pool(processes=cpu) as pool:
-        if tool == "java":
-            pool.starmap(run_fray,
-                         map(lambda it: (it.load_command(), it.path, FRAY_PATH, timeout), run_configs))
-        elif tool == "rr":
-            pool.starmap(run_rr,
-                         map(lambda it: (it.load_command(), it.path, RR_PATH, timeout), run_configs))
-        elif tool == "jpf":
-            pool.starmap(run_jpf,
-                         map(lambda it: (it.load_command(), it.path, JPF_PATH, timeout), run_configs))
-        # elif tool == "stat":
-        #     pool.starmap(run_stats_collector, map(lambda it: (*it, timeout),
-        #                 app.generate_fray_stats_collector_commands(out_dir)))
-        else:
-            pool.starmap(run_fray,
-                         map(lambda it: (it.load_command(), it.path, FRAY_PATH, timeout), run_configs))
+        jobs.append(Job(runner, saved.load_command(), saved.path, cwd, timeout, application, tool, index))
+    with create_executor(coordinator) as executor:
+        run_jobs(jobs, cpu, executor=executor)
+
+
+@main.command(name="worker")
+@click.argument("coordinator", type=str)
+@click.option("--cpu", type=int, default=6, help="Number of jobs this worker runs at the same time.")
+@click.option("--work-dir", type=str, default=os.path.join(tempfile.gettempdir(), "fray-worker"), show_default=True,
+              help="Scratch directory for job outputs before they are sent back.")
+@pinning_options
+def worker(coordinator: str, cpu: int, work_dir: str, pin: bool, cores_per_job: int, numa: bool):
+    allocator = SlotAllocator(cpu, cores_per_job, numa) if pin else None
+    run_worker(parse_address(coordinator), cpu, work_dir, shared_token(), allocator)
 
 
 @main.command(name="runSingle")
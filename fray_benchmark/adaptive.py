@@ -0,0 +1,100 @@
+import math
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .history import RuntimeHistory
+from .objects.job import Job
+
+# 95% two-sided normal quantile.
+CONFIDENCE_Z = 1.96
+# A test converges once the detection-rate interval is at most this wide
+# and the time-to-bug interval is within this fraction of its mean.
+DEFAULT_RATE_WIDTH = 0.3
+DEFAULT_TIME_PRECISION = 0.25
+DEFAULT_MIN_TRIALS = 5
+
+REPORT_PATTERN = re.compile(r"^(Error Found|No Error|Run failed): (\d+(?:\.\d+)?)")
+TRIAL_PATTERN = re.compile(r"^iter-(\d+)$")
+
+
+def read_trial(log_path: str) -> Optional[Tuple[bool, float]]:
+    report_path = os.path.join(log_path, "report.txt")
+    if not os.path.exists(report_path):
+        return None
+    with open(report_path) as f:
+        match = REPORT_PATTERN.match(f.readline())
+    if match is None or match.group(1) == "Run failed":
+        return None
+    return match.group(1) == "Error Found", float(match.group(2))
+
+
+def trial_index(job: Job) -> int:
+    # Jobs live in .../<technique>/iter-<n>/<index>.
+    match = TRIAL_PATTERN.match(os.path.basename(os.path.dirname(job.log_path)))
+    return int(match.group(1)) if match else 0
+
+
+def wilson_interval(successes: int, trials: int, z: float = CONFIDENCE_Z) -> Tuple[float, float]:
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+
+def mean_interval(samples: List[float], z: float = CONFIDENCE_Z) -> Tuple[float, float]:
+    mean = sum(samples) / len(samples)
+    if len(samples) < 2:
+        return mean, math.inf
+    variance = sum((sample - mean) ** 2 for sample in samples) / (len(samples) - 1)
+    return mean, z * math.sqrt(variance / len(samples))
+
+
+class AdaptiveStopper:
+    # Tracks the trials of every (test, technique) and decides when more
+    # trials would not change the detection rate or time-to-bug estimate.
+    def __init__(self, min_trials: int = DEFAULT_MIN_TRIALS, rate_width: float = DEFAULT_RATE_WIDTH,
+                 time_precision: float = DEFAULT_TIME_PRECISION) -> None:
+        self.min_trials = min_trials
+        self.rate_width = rate_width
+        self.time_precision = time_precision
+        self.trials: Dict[str, List[Tuple[bool, float]]] = {}
+
+    def record(self, job: Job):
+        trial = read_trial(job.log_path)
+        if trial is not None:
+            self.trials.setdefault(RuntimeHistory.key(job), []).append(trial)
+
+    def converged(self, job: Job) -> bool:
+        trials = self.trials.get(RuntimeHistory.key(job), [])
+        if len(trials) < self.min_trials:
+            return False
+        bug_times = [elapsed for found, elapsed in trials if found]
+        low, high = wilson_interval(len(bug_times), len(trials))
+        if high - low > self.rate_width:
+            return False
+        # With fewer than two bugs there is no time-to-bug spread to pin down.
+        if len(bug_times) < 2:
+            return True
+        mean, half_width = mean_interval(bug_times)
+        return half_width <= self.time_precision * mean
+
+    def summary(self, job: Job) -> str:
+        trials = self.trials.get(RuntimeHistory.key(job), [])
+        bug_times = [elapsed for found, elapsed in trials if found]
+        low, high = wilson_interval(len(bug_times), len(trials))
+        text = f"{len(bug_times)}/{len(trials)} found, rate [{low:.2f}, {high:.2f}]"
+        if bug_times:
+            mean, half_width = mean_interval(bug_times)
+            text += f", time to bug {mean:.1f}s ± {half_width:.1f}s"
+        return text
+
+
+def order_trials(jobs: List[Job]) -> List[Job]:
+    # Iteration-major order: every test gets its first trials before any
+    # test gets more, so convergence is detected before the queue is spent.
+    # The sort is stable and keeps the longest-first order within a trial.
+    return sorted(jobs, key=trial_index)
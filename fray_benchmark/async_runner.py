@@ -0,0 +1,169 @@
+import asyncio
+import os
+import re
+import signal
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from .objects.job import Job, ProcessResult, ProcessSpec
+from .utils import (ACTIVE_GROUPS, RUNNERS, TERMINATION_GRACE, TERMINATION_SIGNALS, TRIAL_POLL_INTERVAL,
+                    FrayTrials, LogTail, finish_job, finish_run, kill_process_group, pin_command, prepare_job)
+
+STREAM_CHUNK = 1 << 16
+USAGE_INTERVAL = 1.0
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+VMHWM_PATTERN = re.compile(r"^VmHWM:\s+(\d+) kB", re.MULTILINE)
+
+
+def process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    for parent in pids:
+        try:
+            with open(f"/proc/{parent}/task/{parent}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+class UsageSampler:
+    # The event loop reaps the child itself, so wait4's rusage is not
+    # available. Peak RSS and CPU time of the process tree are sampled from
+    # /proc instead; CPU time spent after the last sample is missed.
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.peak_rss = 0
+        self.user_time = 0.0
+        self.sys_time = 0.0
+
+    def sample(self):
+        user = 0
+        system = 0
+        for pid in process_tree(self.pid):
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    match = VMHWM_PATTERN.search(f.read())
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            if match:
+                self.peak_rss = max(self.peak_rss, int(match.group(1)))
+            # utime, stime, cutime, cstime; the c* fields cover reaped children.
+            user += int(fields[11]) + int(fields[13])
+            system += int(fields[12]) + int(fields[14])
+        self.user_time = max(self.user_time, user / CLOCK_TICKS)
+        self.sys_time = max(self.sys_time, system / CLOCK_TICKS)
+
+    async def run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(USAGE_INTERVAL)
+
+
+async def stream_to_file(stream: asyncio.StreamReader, path: str):
+    # Output reaches the log as it is produced, so a running job can be
+    # followed with tail -f.
+    with open(path, "wb") as f:
+        while True:
+            chunk = await stream.read(STREAM_CHUNK)
+            if not chunk:
+                return
+            f.write(chunk)
+            f.flush()
+
+
+async def start_process(command: List[str], cwd: str, stdout: Optional[str] = None, stderr: Optional[str] = None,
+                        env=None):
+    # Every job runs in its own process group so that the deadline reaches
+    # the JVM behind the time/timeout/rr wrappers.
+    proc = await asyncio.create_subprocess_exec(
+        *command, cwd=cwd, env=env, start_new_session=True, stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL if stdout is None else subprocess.PIPE,
+        stderr=subprocess.DEVNULL if stderr is None else subprocess.PIPE)
+    ACTIVE_GROUPS.add(proc.pid)
+    writers = []
+    if stdout is not None:
+        writers.append(asyncio.ensure_future(stream_to_file(proc.stdout, stdout)))
+    if stderr is not None:
+        writers.append(asyncio.ensure_future(stream_to_file(proc.stderr, stderr)))
+    sampler = UsageSampler(proc.pid)
+    return proc, writers, sampler, asyncio.ensure_future(sampler.run())
+
+
+async def stop_process(proc, writers, sampling):
+    # Do not leave stray processes of the job behind.
+    kill_process_group(proc.pid)
+    ACTIVE_GROUPS.discard(proc.pid)
+    sampling.cancel()
+    await asyncio.gather(*writers, return_exceptions=True)
+
+
+async def run_process_async(spec: ProcessSpec) -> ProcessResult:
+    start_time = time.time()
+    proc, writers, sampler, sampling = await start_process(spec.command, spec.cwd, spec.stdout, spec.stderr,
+                                                           spec.env)
+    reason = "exited"
+    timed_out = False
+    try:
+        waiter = asyncio.ensure_future(proc.wait())
+        done, _ = await asyncio.wait([waiter], timeout=spec.timeout)
+        if not done:
+            for sig in TERMINATION_SIGNALS:
+                if not kill_process_group(proc.pid, sig):
+                    break
+                reason = f"timeout:{sig.name}"
+                timed_out = True
+                done, _ = await asyncio.wait([waiter], timeout=TERMINATION_GRACE)
+                if done:
+                    break
+        returncode = await waiter
+    except BaseException:
+        kill_process_group(proc.pid)
+        raise
+    finally:
+        await stop_process(proc, writers, sampling)
+    if reason == "exited" and returncode < 0:
+        reason = f"signal:{signal.Signals(-returncode).name}"
+    return ProcessResult(returncode, time.time() - start_time, sampler.peak_rss, reason,
+                         sampler.user_time, sampler.sys_time, timed_out)
+
+
+async def run_fray_trials_async(command: Union[List[str], Dict[str, Any]], log_path: str, cwd: str, timeout: int,
+                                trials: int) -> ProcessResult:
+    state = FrayTrials(command, log_path, timeout, trials)
+    while state.done < trials:
+        process_command, log_file = state.start_process()
+        start_time = time.time()
+        proc, writers, sampler, sampling = await start_process(process_command, cwd, env=state.env)
+        tail = LogTail(log_file)
+        try:
+            while True:
+                exited = proc.returncode is not None
+                state.feed(tail.read_lines(exited))
+                if exited:
+                    break
+                sig = state.stop_signal(time.time())
+                if sig is not None:
+                    kill_process_group(proc.pid, sig)
+                await asyncio.sleep(TRIAL_POLL_INTERVAL)
+        except BaseException:
+            kill_process_group(proc.pid)
+            raise
+        finally:
+            tail.close()
+            await stop_process(proc, writers, sampling)
+        state.finish_process(ProcessResult(proc.returncode, time.time() - start_time, sampler.peak_rss,
+                                           state.reason, sampler.user_time, sampler.sys_time,
+                                           state.stop_time is not None))
+    return state.result()
+
+
+async def run_job_async(job: Job) -> Job:
+    prepare_job(job)
+    command = pin_command(job.command, job.cpus)
+    if job.trials > 1:
+        return finish_job(job, await run_fray_trials_async(command, job.log_path, job.cwd, job.timeout, job.trials))
+    spec, report = RUNNERS[job.tool]
+    return finish_run(job, report, await run_process_async(spec(command, job.log_path, job.cwd, job.timeout)))
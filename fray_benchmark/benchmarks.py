@@ -1,24 +1,44 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import Dict
-
-import glob
 import importlib
-import os
-import inspect
-from .commons import SCRIPT_PATH
-from .bm_configs.benchmark_base import BenchmarkBase, UnitTestBenchmark, MainMethodBenchmark, SavedBenchmark
-BENCHMARKS: Dict[str, BenchmarkBase] = {}
-
-for file in glob.glob(os.path.join(SCRIPT_PATH, "bm_configs/*.py")):
-    name = os.path.splitext(os.path.basename(file))[0]
-    try:
-        spec = importlib.util.find_spec(f"fray_benchmark.bm_configs.{name}")
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        for n, obj in inspect.getmembers(module):
-            if isinstance(obj, type) and issubclass(obj, BenchmarkBase) and obj != BenchmarkBase and obj != UnitTestBenchmark and obj != MainMethodBenchmark and obj != SavedBenchmark:
-                app = obj()  # type: ignore
-                BENCHMARKS[app.name] = app
-    except ImportError as e:
-        continue
+from typing import Dict, Iterator, Mapping
+
+from .bm_configs.benchmark_base import BenchmarkBase
+
+# Benchmark name -> "<module in bm_configs>:<class>". Names are known without
+# importing anything; a benchmark module is imported and its config built
+# (which resolves classpaths and reads test cases) only when it is looked up.
+BENCHMARK_MANIFEST: Dict[str, str] = {
+    "guava": "guava:GuavaBenchmark",
+    "httpcore": "httpcore:HttpcoreBenchmark",
+    "jacontebe": "jacontebe:JaConTeBe",
+    "kafka": "kafka:KafkaBenchmark",
+    "lincheck": "lincheck:LinCheckBenchmark",
+    "lucene": "lucene:LuceneBenchmark",
+    "sctbench": "sctbench:SCTBenchBenchmark",
+}
+
+
+class LazyBenchmarks(Mapping[str, BenchmarkBase]):
+    def __init__(self, manifest: Dict[str, str]) -> None:
+        self.manifest = manifest
+        self.loaded: Dict[str, BenchmarkBase] = {}
+
+    def __getitem__(self, name: str) -> BenchmarkBase:
+        if name not in self.loaded:
+            module_name, class_name = self.manifest[name].split(":")
+            module = importlib.import_module(f"{__package__}.bm_configs.{module_name}")
+            self.loaded[name] = getattr(module, class_name)()
+        return self.loaded[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.manifest
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.manifest)
+
+    def __len__(self) -> int:
+        return len(self.manifest)
+
+
+BENCHMARKS = LazyBenchmarks(BENCHMARK_MANIFEST)
@@ -1,259 +1,326 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import copy
+import hashlib
+import json
 import os
-from typing import List, Iterator, Tuple, Dict
+import shutil
+import tempfile
+from dataclasses import replace
+from typing import Any, List, Iterator, Optional, Tuple, Dict, Union
 from sys import platform
 import re
 
 
-from ..commons import FRAY_PATH, RR_PATH, JPF_PATH, HELPER_PATH, PERF_ITER, FRAY_VERSION
-from ..utils import resolve_classpaths
+from ..commons import FRAY_PATH, RR_PATH, JPF_PATH, HELPER_PATH, OUTPUT_PATH, PERF_ITER, FRAY_VERSION, SCRIPT_PATH
+from ..utils import classpath_argfile, join_classpath, resolve_classpaths
 from ..objects.execution_config import RunConfig, Executor
 
+PLAN_PATH = os.path.join(OUTPUT_PATH, "plans")
+# Bump when get_test_cases or the RunConfig format changes in a way the
+# plan fingerprint does not see.
+PLAN_VERSION = 1
+
+# Test lists of JUnitRunner batches, named after their content so that all
+# iterations and tools share one file per batch.
+JUNIT_BATCH_PATH = os.path.join(OUTPUT_PATH, "batches")
+JUNIT_BATCH_FLAG = "--batch"
+JUNIT_RESULTS_PROPERTY = "fray.junit.results"
+
+
+# Packages the Fray JVMs and the RR/stat JVMs open to the unnamed module.
+FRAY_ADD_OPENS = [
+    "java.base/java.lang",
+    "java.base/java.util",
+    "java.base/java.io",
+    "java.base/java.util.concurrent.atomic",
+    "java.base/sun.nio.ch",
+    "java.base/java.lang.reflect",
+]
+RR_ADD_OPENS = [
+    "java.base/java.lang",
+    "java.base/java.util",
+    "java.base/java.io",
+    "java.base/java.util.concurrent",
+    "java.base/java.util.concurrent.atomic",
+    "java.base/java.lang.reflect",
+]
+
+# (command, log_path, cwd, config, config_file) of one job.
+CommandSpec = Tuple[Union[List[str], Dict[str, Any]], str, str, RunConfig, Optional[str]]
+
+
+def add_opens(packages: List[str]) -> List[str]:
+    return [arg for package in packages for arg in ("--add-opens", f"{package}=ALL-UNNAMED")]
+
+
+def time_prefix(log_path: str) -> List[str]:
+    return ["time", "-p", "-o", f"{log_path}/time.txt"]
+
+
+def application_args(config_data: RunConfig, classpath: str) -> List[str]:
+    args = [classpath]
+    for property_key, property_value in config_data.executor.properties.items():
+        args.append(f"-D{property_key}={property_value}")
+    args.append(config_data.executor.clazz)
+    args.extend(config_data.executor.args)
+    return args
+
+
+def batch_files(config_data: RunConfig) -> List[str]:
+    args = config_data.executor.args
+    return [args[i + 1] for i, arg in enumerate(args[:-1]) if arg == JUNIT_BATCH_FLAG]
+
+
+def write_junit_batch(name: str, test_cases: List[str]) -> str:
+    content = "\n".join(test_cases) + "\n"
+    digest = hashlib.sha256(content.encode()).hexdigest()[:16]
+    path = os.path.join(JUNIT_BATCH_PATH, f"{name}-{digest}.txt")
+    if not os.path.exists(path):
+        os.makedirs(JUNIT_BATCH_PATH, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return path
+
 
 class BenchmarkBase(object):
+    # Memory in MB that one job of each tool may use. The scheduler uses it
+    # until a peak RSS has been measured for the test.
+    memory_budgets: Dict[str, int] = {"fray": 2048, "java": 2048, "rr": 4096, "jpf": 1536, "stat": 1024}
 
     def __init__(self, name: str) -> None:
         self.name = name
+        self.plans: Dict[str, List[Tuple[RunConfig, str]]] = {}
+
+    def memory_budget(self, tool: str) -> int:
+        return self.memory_budgets.get(tool, max(self.memory_budgets.values()))
+
+    def batched(self, batch_size: int) -> "BenchmarkBase":
+        # Only JUnit benchmarks can run several tests in one JVM.
+        return self
+
+    def job_config(self, config_data: RunConfig, log_path: str) -> RunConfig:
+        if JUNIT_BATCH_FLAG not in config_data.executor.args:
+            return config_data
+        # Batched JUnitRunner runs write one result record per test.
+        properties = {**config_data.executor.properties, JUNIT_RESULTS_PROPERTY: f"{log_path}/junit-results.jsonl"}
+        return replace(config_data, executor=replace(config_data.executor, properties=properties))
 
     def build(self) -> None:
         pass
 
-    def generate_java_test_commands(self, config: List[str], out_dir: str, timeout: int, perf_mode: bool) -> Iterator[Tuple[List[str], str, str]]:
-        test_index = 0
-        for config_data in self.get_test_cases("java"):
+    def build_inputs(self) -> List[str]:
+        # Source trees and patches the build reads; `build --all` skips the
+        # benchmark while they are unchanged since its last build.
+        return []
+
+    def plan_inputs(self) -> List[str]:
+        # Files get_test_cases reads besides the test list; a cached test
+        # plan is rebuilt when one of them changes.
+        return []
+
+    def plan_dir(self, tool_name: str) -> str:
+        inputs = []
+        for path in self.plan_inputs():
+            stat = os.stat(path) if os.path.exists(path) else None
+            inputs.append([path, stat.st_mtime, stat.st_size] if stat else [path])
+        key = json.dumps([PLAN_VERSION, self.name, tool_name, getattr(self, "test_cases", []),
+                          getattr(self, "classpath", []), getattr(self, "properties", {}),
+                          getattr(self, "batch_size", 1), inputs])
+        return os.path.join(PLAN_PATH, f"{self.name}-{tool_name}-{hashlib.sha256(key.encode()).hexdigest()[:16]}")
+
+    def test_plan(self, tool_name: str) -> List[Tuple[RunConfig, str]]:
+        # The run configs of all tests, resolved once and stored as one file
+        # per test under output/plans. Jobs link their config.json to these.
+        path = self.plan_dir(tool_name)
+        if path in self.plans:
+            return self.plans[path]
+        plan_path = os.path.join(path, "plan.json")
+        plan = None
+        if os.path.exists(plan_path):
+            with open(plan_path) as f:
+                plan = [(RunConfig.from_json(config), os.path.join(path, f"{i}.json"))
+                        for i, config in enumerate(json.load(f))]
+            if not all(os.path.exists(arg) for config_data, _ in plan for arg in batch_files(config_data)):
+                plan = None
+        if plan is None:
+            configs = [config_data.to_json() for config_data in self.get_test_cases(tool_name)]
+            os.makedirs(PLAN_PATH, exist_ok=True)
+            tmp_path = tempfile.mkdtemp(dir=PLAN_PATH)
+            for i, config in enumerate(configs):
+                with open(os.path.join(tmp_path, f"{i}.json"), "w") as f:
+                    f.write(config)
+            with open(os.path.join(tmp_path, "plan.json"), "w") as f:
+                json.dump(configs, f)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                # Another process stored the same plan first.
+                shutil.rmtree(tmp_path)
+            plan = [(RunConfig.from_json(config), os.path.join(path, f"{i}.json")) for i, config in enumerate(configs)]
+        self.plans[path] = plan
+        return plan
+
+    def test_jobs(self, tool_name: str, out_dir: str) -> Iterator[Tuple[int, str, RunConfig, Optional[str]]]:
+        for test_index, (config_data, config_file) in enumerate(self.test_plan(tool_name)):
             log_path = f"{out_dir}/{test_index}"
-            os.makedirs(log_path, exist_ok=True)
-            with open(f"{log_path}/config.json", "w") as f:
-                f.write(config_data.to_json())
-            test_index += 1
+            job_config = self.job_config(config_data, log_path)
+            # Per-job changes cannot share the plan's file.
+            yield test_index, log_path, job_config, config_file if job_config is config_data else None
+
+    # The generators build the parts of a command that are the same for
+    # every test once and only add the per-test arguments in the loop. They
+    # yield (command, log_path, cwd, config, config_file); config.json is
+    # linked from config_file, or written from config, when the job starts.
+    def generate_java_test_commands(self, config: List[str], out_dir: str, timeout: int, perf_mode: bool) -> Iterator[CommandSpec]:
+        jvm = [
+            f"{FRAY_PATH}/result/java-inst-jdk21/bin/java",
+            "-ea",
+            f"-agentpath:{FRAY_PATH}/result/native-libs/libjvmti.so",
+            f"-javaagent:{FRAY_PATH}/result/libs/fray-instrumentation-agent-{FRAY_VERSION}.jar",
+            *add_opens(FRAY_ADD_OPENS),
+            classpath_argfile([
+                f"{FRAY_PATH}/result/libs/fray-core-{FRAY_VERSION}.jar",
+            ]),
+            "org.pastalab.fray.core.MainKt",
+            "--run-config",
+            "json",
+        ]
+        fray_options = ["--iter", "-1", "--timeout", str(timeout), *config]
+        if perf_mode:
+            fray_options.append("--explore")
+        fray_options.extend(["--iter", "-1"])
+        fray_options.append("--no-fray")
+        for _, log_path, config_data, config_file in self.test_jobs("java", out_dir):
             command = [
-                "time",
-                "-p",
-                "-o",
-                f"{log_path}/time.txt",
+                *time_prefix(log_path),
                 "timeout",
                 "--signal=SIGTERM",
                 "--kill-after=2s",
                 str(timeout + 10),
-                # "taskset",
-                # "-c",
-                # str(test_index - 1),
-                f"{FRAY_PATH}/result/java-inst-jdk21/bin/java",
-                "-ea",
-                f"-agentpath:{FRAY_PATH}/result/native-libs/libjvmti.so",
-                f"-javaagent:{FRAY_PATH}/result/libs/fray-instrumentation-agent-{FRAY_VERSION}.jar",
-                "--add-opens", "java.base/java.lang=ALL-UNNAMED",
-                "--add-opens", "java.base/java.util=ALL-UNNAMED",
-                "--add-opens", "java.base/java.io=ALL-UNNAMED",
-                "--add-opens", "java.base/java.util.concurrent.atomic=ALL-UNNAMED",
-                "--add-opens", "java.base/sun.nio.ch=ALL-UNNAMED",
-                "--add-opens", "java.base/java.lang.reflect=ALL-UNNAMED",
-                "-cp", ":".join(resolve_classpaths([
-                    f"{FRAY_PATH}/result/libs/fray-core-{FRAY_VERSION}.jar",
-                ])),
-                "org.pastalab.fray.core.MainKt",
-                "--run-config",
-                "json",
+                *jvm,
                 "--config-path",
                 f"{log_path}/config.json",
                 "-o", f"{log_path}/report",
-                "--iter", "-1",
-                "--timeout", str(timeout),
-                *config
+                *fray_options,
             ]
-            if perf_mode:
-                command.append("--explore")
-            command.extend(["--iter", "-1"])
-            command.append("--no-fray")
-            yield command, log_path, FRAY_PATH
+            yield command, log_path, FRAY_PATH, config_data, config_file
 
-    def generate_rr_test_commands(self, out_dir: str, timeout: int, perf_mode: bool) -> Iterator[Tuple[List[str], str, str]]:
-        test_index = 0
+    def generate_rr_test_commands(self, out_dir: str, timeout: int, perf_mode: bool) -> Iterator[CommandSpec]:
         java21_path = os.environ.get("JDK21_HOME", "/usr/lib/jvm/java-21-openjdk-amd64")
-        for config_data in self.get_test_cases("rr"):
-            log_path = f"{out_dir}/{test_index}"
-            test_index += 1
-            os.makedirs(log_path, exist_ok=True)
-            with open(f"{log_path}/config.json", "w") as f:
-                f.write(config_data.to_json())
-            command = [f"{java21_path}/bin/java", "-ea"]
-            if self.name != "jacontebe":
-                command.append(f"-javaagent:{HELPER_PATH}/assertion-handler-agent/AssertionHandlerAgent.jar")
-            command.extend(["--add-opens", "java.base/java.lang=ALL-UNNAMED"])
-            command.extend(["--add-opens", "java.base/java.util=ALL-UNNAMED"])
-            command.extend(["--add-opens", "java.base/java.io=ALL-UNNAMED"])
-            command.extend(["--add-opens", "java.base/java.util.concurrent=ALL-UNNAMED"])
-            command.extend(["--add-opens", "java.base/java.util.concurrent.atomic=ALL-UNNAMED"])
-            command.extend(["--add-opens", "java.base/java.lang.reflect=ALL-UNNAMED"])
-            command.extend([f"-cp", ':'.join(config_data.executor.classpaths)])
-            for property_key, property_value in config_data.executor.properties.items():
-                command.append(f"-D{property_key}={property_value}")
-            command.append(config_data.executor.clazz)
-            command.extend(config_data.executor.args)
-
-
-            prefix = [
+        jvm = [f"{java21_path}/bin/java", "-ea"]
+        if self.name != "jacontebe":
+            jvm.append(f"-javaagent:{HELPER_PATH}/assertion-handler-agent/AssertionHandlerAgent.jar")
+        jvm.extend(add_opens(RR_ADD_OPENS))
+        runner = ["timeout", "-s", "INT", str(timeout), "python3", f"{SCRIPT_PATH}/rr_runner.py"]
+        if perf_mode:
+            runner.append("-e")
+        for _, log_path, config_data, config_file in self.test_jobs("rr", out_dir):
+            command = [
                 "/usr/bin/env",
-                "time",
-                "-p",
-                "-o",
-                f"{log_path}/time.txt",
-                "timeout",
-                "-s",
-                "INT",
-                str(timeout),
-                f"{HELPER_PATH}/rr_runner.sh"]
-            if perf_mode:
-                prefix.append("-e")
-            command = prefix + [
+                *time_prefix(log_path),
+                *runner,
                 f"{log_path}/trace",
-                "./build/bin/rr", "record", "--chaos", "-o", f"{log_path}/trace"] + command
-            yield command, log_path, RR_PATH
+                "./build/bin/rr", "record", "--chaos", "-o", f"{log_path}/trace",
+                *jvm,
+                *application_args(config_data, classpath_argfile(config_data.executor.classpaths)),
+            ]
+            yield command, log_path, RR_PATH, config_data, config_file
 
-    def generate_jpf_test_commands(self, out_dir: str, timeout: int, perf_mode: bool) -> Iterator[Tuple[List[str], str, str]]:
-        test_index = 0
+    def generate_jpf_test_commands(self, out_dir: str, timeout: int, perf_mode: bool) -> Iterator[CommandSpec]:
         java11_path = os.environ.get("JDK11_HOME", "/usr/lib/jvm/java-11-openjdk-amd64")
-        for config_data in self.get_test_cases("jpf"):
-            log_path = f"{out_dir}/{test_index}"
-            test_index += 1
-            os.makedirs(log_path, exist_ok=True)
-            with open(f"{log_path}/config.json", "w") as f:
-                f.write(config_data.to_json())
-            command = [
-                "time",
-                "-p",
-                "-o",
-                f"{log_path}/time.txt",
-                "timeout",
-                "-s",
-                "INT",
-                str(timeout),
-                java11_path + "/bin/java",
-                "-Xmx1024m", "-ea",
-                "--add-opens", "java.base/jdk.internal.misc=ALL-UNNAMED",
-                "-jar",
-                JPF_PATH + "/build/RunJPF.jar",
-                ]
-            if perf_mode:
-                command.append("+search.multiple_errors=true")
-            command.append("+search.class=gov.nasa.jpf.search.RandomSearch")
-            command.append("+search.RandomSearch.path_limit=10000000")
-            command.append("+cg.randomize_choices=FIXED_SEED")
-            command.append("+report.console.property_violation=error,statistics")
-            command.append(f"+cg.seed={test_index}")
-            command.append(f"+classpath={':'.join(config_data.executor.classpaths)}")
-            command.append(config_data.executor.clazz)
-            command.extend(config_data.executor.args)
-            command = {
-                "command": command,
-                "env": {
-                    "JAVA_HOME": os.environ.get("JDK11_HOME", "/usr/lib/jvm/java-11-openjdk-amd64"),
-                    # "JVM_FLAGS": "-Xmx1024m -ea --add-opens java.base/jdk.internal.misc=ALL-UNNAMED"
-                }
-            }
-            yield command, log_path, JPF_PATH
-
-    def generate_fray_stats_collector_commands(self, out_dir: str) -> Iterator[Tuple[List[str], str, str]]:
-        test_index = 0
-        for config_data in self.get_test_cases("fray-stat"):
-            log_path = f"{out_dir}/{test_index}"
-            os.makedirs(log_path, exist_ok=True)
-            with open(f"{log_path}/config.json", "w") as f:
-                f.write(config_data.to_json())
-            test_index += 1
+        jvm = [
+            "timeout",
+            "-s",
+            "INT",
+            str(timeout),
+            java11_path + "/bin/java",
+            "-Xmx1024m", "-ea",
+            "--add-opens", "java.base/jdk.internal.misc=ALL-UNNAMED",
+            "-jar",
+            JPF_PATH + "/build/RunJPF.jar",
+        ]
+        if perf_mode:
+            jvm.append("+search.multiple_errors=true")
+        jvm.append("+search.class=gov.nasa.jpf.search.RandomSearch")
+        jvm.append("+search.RandomSearch.path_limit=10000000")
+        jvm.append("+cg.randomize_choices=FIXED_SEED")
+        jvm.append("+report.console.property_violation=error,statistics")
+        env = {
+            "JAVA_HOME": java11_path,
+            # "JVM_FLAGS": "-Xmx1024m -ea --add-opens java.base/jdk.internal.misc=ALL-UNNAMED"
+        }
+        for test_index, log_path, config_data, config_file in self.test_jobs("jpf", out_dir):
             command = [
-                f"java",
-                "-ea",
-                f"-javaagent:/home/aoli/lib/jacocoagent.jar=destfile=/home/aoli/tmp/jacoco2.exec",
-                "--add-opens", "java.base/java.lang=ALL-UNNAMED",
-                "--add-opens", "java.base/java.util=ALL-UNNAMED",
-                "--add-opens", "java.base/java.io=ALL-UNNAMED",
-                "--add-opens", "java.base/java.util.concurrent.atomic=ALL-UNNAMED",
-                "--add-opens", "java.base/sun.nio.ch=ALL-UNNAMED",
-                "--add-opens", "java.base/java.lang.reflect=ALL-UNNAMED",
+                *time_prefix(log_path),
+                *jvm,
+                f"+cg.seed={test_index + 1}",
+                f"+classpath={':'.join(config_data.executor.classpaths)}",
+                config_data.executor.clazz,
+                *config_data.executor.args,
             ]
-            command.extend([f"-cp", ':'.join(config_data.executor.classpaths)])
-            for property_key, property_value in config_data.executor.properties.items():
-                command.append(f"-D{property_key}={property_value}")
-            command.append(config_data.executor.clazz)
-            command.extend(config_data.executor.args)
+            yield {"command": command, "env": env}, log_path, JPF_PATH, config_data, config_file
+
+    def generate_fray_stats_collector_commands(self, out_dir: str) -> Iterator[CommandSpec]:
+        jvm = [
+            f"java",
+            "-ea",
+            f"-javaagent:/home/aoli/lib/jacocoagent.jar=destfile=/home/aoli/tmp/jacoco2.exec",
+            *add_opens(FRAY_ADD_OPENS),
+        ]
+        for _, log_path, config_data, config_file in self.test_jobs("fray-stat", out_dir):
+            command = [*jvm, *application_args(config_data, classpath_argfile(config_data.executor.classpaths))]
             command.append("true")
-            yield command, log_path, FRAY_PATH
-
-
-    def generate_lincheck_test_commands(self, config: List[str], out_dir: str, timeout: int, perf_mode: bool) -> Iterator[Tuple[List[str], str, str]]:
-        test_index = 0
-        for config_data in self.get_test_cases("fray"):
-            log_path = f"{out_dir}/{test_index}"
-            os.makedirs(log_path, exist_ok=True)
-            with open(f"{log_path}/config.json", "w") as f:
-                f.write(config_data.to_json())
-            test_index += 1
+            yield command, log_path, FRAY_PATH, config_data, config_file
+
+    def generate_lincheck_test_commands(self, config: List[str], out_dir: str, timeout: int, perf_mode: bool) -> Iterator[CommandSpec]:
+        jvm = [
+            "timeout",
+            "-s",
+            "INT",
+            str(timeout + 120),
+            f"{FRAY_PATH}/instrumentation/jdk/build/java-inst/bin/java",
+            "-ea",
+            "-Xmx4g",
+            f"-agentpath:{FRAY_PATH}/jvmti/build/native-libs/libjvmti.so",
+            f"-javaagent:{FRAY_PATH}/instrumentation/agent/build/libs/fray-instrumentation-agent-{FRAY_VERSION}.jar",
+            *add_opens(FRAY_ADD_OPENS),
+            classpath_argfile([
+                f"{FRAY_PATH}/core/build/libs/fray-core-{FRAY_VERSION}.jar",
+                f"{FRAY_PATH}/junit/build/libs/fray-junit-{FRAY_VERSION}.jar",
+                f"{FRAY_PATH}/core/build/dependency/*.jar",
+                f"{FRAY_PATH}/junit/build/dependency/*.jar",
+            ]),
+            "org.pastalab.fray.core.MainKt",
+            "--run-config",
+            "json",
+        ]
+        fray_options = ["--iter", "-1", "--timeout", str(timeout), *config]
+        if perf_mode:
+            fray_options.append("--explore")
+        fray_options.extend(["--iter", "-1"])
+        for _, log_path, config_data, config_file in self.test_jobs("fray", out_dir):
             command = [
-                "time",
-                "-p",
-                "-o",
-                f"{log_path}/time.txt",
-                "timeout",
-                "-s",
-                "INT",
-                str(timeout + 120),
-                f"{FRAY_PATH}/instrumentation/jdk/build/java-inst/bin/java",
-                "-ea",
-                "-Xmx4g",
-                f"-agentpath:{FRAY_PATH}/jvmti/build/native-libs/libjvmti.so",
-                f"-javaagent:{FRAY_PATH}/instrumentation/agent/build/libs/fray-instrumentation-agent-{FRAY_VERSION}.jar",
-                "--add-opens", "java.base/java.lang=ALL-UNNAMED",
-                "--add-opens", "java.base/java.util=ALL-UNNAMED",
-                "--add-opens", "java.base/java.io=ALL-UNNAMED",
-                "--add-opens", "java.base/java.util.concurrent.atomic=ALL-UNNAMED",
-                "--add-opens", "java.base/sun.nio.ch=ALL-UNNAMED",
-                "--add-opens", "java.base/java.lang.reflect=ALL-UNNAMED",
-                "-cp", ":".join(resolve_classpaths([
-                    f"{FRAY_PATH}/core/build/libs/fray-core-{FRAY_VERSION}.jar",
-                    f"{FRAY_PATH}/junit/build/libs/fray-junit-{FRAY_VERSION}.jar",
-                    f"{FRAY_PATH}/core/build/dependency/*.jar",
-                    f"{FRAY_PATH}/junit/build/dependency/*.jar",
-                ])),
-                "org.pastalab.fray.core.MainKt",
-                "--run-config",
-                "json",
+                *time_prefix(log_path),
+                *jvm,
                 "--config-path",
                 f"{log_path}/config.json",
                 "-o", f"{log_path}/report",
-                "--iter", "-1",
-                "--timeout", str(timeout),
-                *config
+                *fray_options,
             ]
-            if perf_mode:
-                command.append("--explore")
-            command.extend(["--iter", "-1"])
-            yield command, log_path, FRAY_PATH
-
-
-
-    def generate_fray_test_commands(self, config: List[str], out_dir: str, timeout: int, perf_mode: bool) -> Iterator[Tuple[List[str], str, str]]:
-        test_index = 0
-        for config_data in self.get_test_cases("fray"):
-            log_path = f"{out_dir}/{test_index}"
-            os.makedirs(log_path, exist_ok=True)
-            with open(f"{log_path}/config.json", "w") as f:
-                f.write(config_data.to_json())
-            test_index += 1
+            yield command, log_path, FRAY_PATH, config_data, config_file
 
-            print(f"DEBUG: config_data.executor.classpaths has {len(config_data.executor.classpaths)} entries")
-            resolved = resolve_classpaths(config_data.executor.classpaths)
-            print(f"DEBUG: After resolve_classpaths: {len(resolved)} entries")
-            print(f"DEBUG: First 10 entries: {resolved[:10]}")
-            classpath_str = ":".join(resolved)
-
-            command = [
-                f"{FRAY_PATH}/result/bin/fray",
-                "-cp",
-                classpath_str,
-            ]
+    def generate_fray_test_commands(self, config: List[str], out_dir: str, timeout: int, perf_mode: bool) -> Iterator[CommandSpec]:
+        fray_options = ["--", *config, "--iter", "-1", "--sleep-as-yield", "--timeout", str(timeout)]
+        for _, log_path, config_data, config_file in self.test_jobs("fray", out_dir):
+            # The launcher does not read @argfiles; it gets the test
+            # classpath from CLASSPATH instead of the command line.
+            command = [f"{FRAY_PATH}/result/bin/fray"]
 
             for key, value in config_data.executor.properties.items():
                 command.append(f"-J-D{key}={value}")
@@ -262,15 +329,14 @@ class BenchmarkBase(object):
             command.append(config_data.executor.clazz)
             command.extend(config_data.executor.args)
 
-            command.append("--")
-            command.extend(config)
-            command.extend(["--iter", "-1", "--sleep-as-yield", "--timeout", str(timeout)])
+            command.extend(fray_options)
             command.extend(["-o", f"{log_path}/report"])
 
             if perf_mode:
                 command.append("--explore")
 
-            yield command, log_path, FRAY_PATH
+            env = {"CLASSPATH": join_classpath(config_data.executor.classpaths)}
+            yield {"command": command, "env": env}, log_path, FRAY_PATH, config_data, config_file
 
     def get_test_cases(self, _tool_name: str) -> Iterator[RunConfig]:
         return iter([])
@@ -280,10 +346,15 @@ class SavedBenchmark:
         self.new_index = index
         self.path = os.path.abspath(path)
 
-    def load_command(self) -> List[str]:
+    def load_command(self) -> Union[List[str], Dict[str, Any]]:
         command = open(os.path.join(self.path, "command.txt")).read().strip()
-        updated_command = re.sub(r"taskset -c \d+", f"taskset -c {self.new_index}", command)
-        return updated_command.split(" ")
+        updated_command = re.sub(r"taskset -c [\d,]+", f"taskset -c {self.new_index}", command).split(" ")
+        # Commands with their own environment are saved whole in command.json.
+        json_path = os.path.join(self.path, "command.json")
+        if os.path.exists(json_path):
+            with open(json_path) as f:
+                return {**json.load(f), "command": updated_command}
+        return updated_command
 
 class MainMethodBenchmark(BenchmarkBase):
     def __init__(self, name: str, classpath: List[str], test_cases: List[str], properties: Dict[str, str]) -> None:
@@ -309,6 +380,8 @@ class MainMethodBenchmark(BenchmarkBase):
 
 
 class UnitTestBenchmark(BenchmarkBase):
+    memory_budgets: Dict[str, int] = {"fray": 3072, "java": 3072, "rr": 6144, "jpf": 1536, "stat": 2048}
+
     def __init__(self, name: str, classpath: List[str], test_cases: List[str], properties: Dict[str, str], is_junit4: bool) -> None:
         super().__init__(name)
         self.test_cases = test_cases
@@ -318,11 +391,27 @@ class UnitTestBenchmark(BenchmarkBase):
         ])
         self.properties = properties
         self.is_junit4 = is_junit4
-
-    def generate_collector_command(self) -> List[str]:
+        self.batch_size = 1
+
+    def batched(self, batch_size: int) -> "BenchmarkBase":
+        app = copy.copy(self)
+        app.batch_size = batch_size
+        return app
+
+    def test_selectors(self) -> Iterator[List[str]]:
+        # Arguments of JUnitRunner after the junit4/junit5 flag.
+        if self.batch_size <= 1:
+            for test_case in self.test_cases:
+                yield [f"{test_case}"]
+            return
+        for i in range(0, len(self.test_cases), self.batch_size):
+            yield [JUNIT_BATCH_FLAG, write_junit_batch(self.name, self.test_cases[i:i + self.batch_size])]
+
+    def generate_collector_command(self, output_path: str, exclude: Optional[str] = None) -> List[str]:
+        # The junit-analyzer agent writes its per-test records to output_path.
         command = [
             "java",  # Use system Java for test discovery (no instrumentation needed)
-            f"-javaagent:{HELPER_PATH}/junit-analyzer/build/libs/junit-analyzer-all.jar",
+            f"-javaagent:{HELPER_PATH}/junit-analyzer/build/libs/junit-analyzer-all.jar={output_path}",
             "--add-opens", "java.base/java.lang=ALL-UNNAMED",
             "--add-opens", "java.base/java.util=ALL-UNNAMED",
             "--add-opens", "java.base/java.io=ALL-UNNAMED",
@@ -334,19 +423,20 @@ class UnitTestBenchmark(BenchmarkBase):
             "execute",
             "--scan-classpath",
         ] + sum([["-cp", cp] for cp in self.classpath], [])
-        print(" ".join(command))
+        if exclude is not None:
+            command.extend(["--exclude-classname", exclude])
         return command
 
 
     def get_test_cases(self, _tool_name: str) -> Iterator[RunConfig]:
-        for test_case in self.test_cases:
+        for selector in self.test_selectors():
             yield RunConfig(
                 Executor(
                     "org.pastalab.fray.helpers.JUnitRunner",
                     "main",
                     [
                         "junit4" if self.is_junit4 else "junit5",
-                        f"{test_case}",
+                        *selector,
                     ],
                     self.classpath,
                     self.properties
@@ -3,6 +3,7 @@
 
 import os
 import subprocess
+from typing import List
 
 from .benchmark_base import UnitTestBenchmark
 from ..commons import ARTIFACTS_PATH, ASSETS_PATH
@@ -22,19 +23,22 @@ class GuavaBenchmark(UnitTestBenchmark):
             {},
             True)
 
+    def build_inputs(self) -> List[str]:
+        return [os.path.join(self.guava_test_dir, "..")]
+
     def build(self) -> None:
-        subprocess.call([
+        subprocess.check_call([
             "./mvnw",
             "-DskipTests",
             "install"
         ], cwd=os.path.join(self.guava_test_dir, ".."))
-        subprocess.call([
+        subprocess.check_call([
             "../mvnw",
             "-DskipTests",
             "package",
             "source:jar"
         ], cwd=self.guava_test_dir)
-        subprocess.call([
+        subprocess.check_call([
             "../mvnw",
             "dependency:copy-dependencies"
         ], cwd=self.guava_test_dir)
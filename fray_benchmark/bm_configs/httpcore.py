@@ -1,5 +1,6 @@
 import os
 import subprocess
+from typing import List
 
 from .benchmark_base import UnitTestBenchmark
 from ..commons import ARTIFACTS_PATH, ASSETS_PATH
@@ -33,24 +34,27 @@ class HttpcoreBenchmark(UnitTestBenchmark):
             True  # JUnit 4
         )
 
+    def build_inputs(self) -> List[str]:
+        return [self.bench_dir, os.path.join(ASSETS_PATH, f"{self.name}.patch")]
+
     def build(self) -> None:
         java11_home = os.environ.get("JDK11_HOME", "/usr/lib/jvm/java-11-openjdk")
         env = os.environ.copy()
         env["JAVA_HOME"] = java11_home
 
         # Apply patch to update Java version from 1.5 to 1.8
-        subprocess.call([
+        subprocess.check_call([
             "git",
             "checkout",
             "."
         ], cwd=self.bench_dir)
-        subprocess.call([
+        subprocess.check_call([
             "git",
             "apply",
             os.path.join(ASSETS_PATH, f"{self.name}.patch")
         ], cwd=self.bench_dir)
 
-        subprocess.call([
+        subprocess.check_call([
             "mvn",
             "clean",
             "install",
@@ -58,19 +62,19 @@ class HttpcoreBenchmark(UnitTestBenchmark):
             "-Dmaven.test.skip=true",
         ], cwd=self.bench_dir, env=env)
 
-        subprocess.call([
+        subprocess.check_call([
             "mvn",
             "test-compile",
         ], cwd=self.bench_dir, env=env)
 
         # Generate source jars
-        subprocess.call([
+        subprocess.check_call([
             "mvn",
             "source:jar",
         ], cwd=self.bench_dir, env=env)
 
         # Copy dependencies for httpcore module
-        subprocess.call([
+        subprocess.check_call([
             "mvn",
             "dependency:copy-dependencies",
         ], cwd=self.bench_dir, env=env)
\ No newline at end of file
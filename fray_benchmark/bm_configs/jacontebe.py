@@ -1,6 +1,7 @@
 import os
 import subprocess
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 from ..objects.execution_config import RunConfig, Executor
 from ..commons import ARTIFACTS_PATH, ASSETS_PATH
@@ -16,11 +17,17 @@ class JaConTeBe(BenchmarkBase):
             os.path.join(ASSETS_PATH, "jacontebe.txt"))
         super().__init__("jacontebe")
 
+    def test_plan_path(self, test_case: str) -> str:
+        return os.path.join(self.bench_dir, "testplans.alt", "jpfscripts", f"{test_case}.jpf")
+
+    def plan_inputs(self) -> List[str]:
+        return [self.test_plan_path(test_case) for test_case in self.test_cases]
+
     def get_test_cases(self, tool_type: str) -> Iterator[RunConfig]:
         target_pattern = re.compile(r"target = ([a-zA-Z0-9_.-]*)")
         cp_pattern = re.compile(r"classpath = ([a-zA-Z0-9_.-:-]*)")
         for test_case in self.test_cases:
-            with open(os.path.join(self.bench_dir, "testplans.alt", "jpfscripts", f"{test_case}.jpf")) as f:
+            with open(self.test_plan_path(test_case)) as f:
                 run_config = f.read()
                 target_match = target_pattern.search(run_config)
                 cp_match = cp_pattern.search(run_config)
@@ -51,11 +58,25 @@ class JaConTeBe(BenchmarkBase):
                         True,
                     )
 
+    def build_inputs(self) -> List[str]:
+        return [self.bench_dir]
+
+    def install(self, test_case: str) -> int:
+        # Every case is copied and compiled into its own build/<case>, so the
+        # installs can run side by side.
+        result = subprocess.run([
+            "./scripts/install.sh",
+            "orig",
+            test_case
+        ], cwd=self.bench_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        print(f"{test_case}:\n{result.stdout}", end="", flush=True)
+        return result.returncode
+
     def build(self) -> None:
-        for test_case in self.test_cases:
-            print(self.bench_dir)
-            subprocess.call([
-                "./scripts/install.sh",
-                "orig",
-                test_case
-            ], cwd=self.bench_dir)
+        print(self.bench_dir)
+        # Uses the cores this process is pinned to by `build --all`.
+        with ThreadPoolExecutor(len(os.sched_getaffinity(0))) as pool:
+            returncodes = list(pool.map(self.install, self.test_cases))
+        failed = [test_case for test_case, returncode in zip(self.test_cases, returncodes) if returncode != 0]
+        if failed:
+            raise RuntimeError(f"install.sh failed for {', '.join(failed)}")
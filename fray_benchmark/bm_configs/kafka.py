@@ -1,5 +1,6 @@
 import os
 import subprocess
+from typing import List
 
 from .benchmark_base import UnitTestBenchmark
 from ..commons import ARTIFACTS_PATH, ASSETS_PATH
@@ -25,38 +26,41 @@ class KafkaBenchmark(UnitTestBenchmark):
             },
             False)
 
+    def build_inputs(self) -> List[str]:
+        return [self.bench_dir, os.path.join(ASSETS_PATH, f"{self.name}.patch")]
+
     def build(self) -> None:
-        subprocess.call([
+        subprocess.check_call([
             "git",
             "checkout",
             "."
         ], cwd=self.bench_dir)
-        subprocess.call([
+        subprocess.check_call([
             "git",
             "apply",
             os.path.join(ASSETS_PATH, f"{self.name}.patch")
         ], cwd=self.bench_dir)
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "testJar",
         ], cwd=self.bench_dir)
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "jar",
         ], cwd=self.bench_dir)
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "srcJar",
         ], cwd=self.bench_dir)
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "testSrcJar",
         ], cwd=self.bench_dir)
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "copyDependencies",
         ], cwd=self.bench_dir)
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "copySourcesToClasses",
         ], cwd=self.bench_dir)
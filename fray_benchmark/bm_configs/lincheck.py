@@ -3,7 +3,7 @@
 
 import os
 import subprocess
-from typing import Iterator
+from typing import List, Iterator
 
 from fray_benchmark.objects.execution_config import RunConfig
 
@@ -13,6 +13,9 @@ from ..utils import load_test_cases
 
 
 class LinCheckBenchmark(MainMethodBenchmark):
+    # Lincheck jobs run with -Xmx4g.
+    memory_budgets = {**MainMethodBenchmark.memory_budgets, "fray": 5120, "java": 5120}
+
     def __init__(self) -> None:
         self.bench_dir = os.path.join(ARTIFACTS_PATH, "licheck")
         super().__init__(
@@ -28,16 +31,19 @@ class LinCheckBenchmark(MainMethodBenchmark):
             {}
         )
 
+    def build_inputs(self) -> List[str]:
+        return [self.bench_dir]
+
     def build(self) -> None:
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "jar",
         ], cwd=self.bench_dir)
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "build",
         ], cwd=self.bench_dir)
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "copyDependencies",
         ], cwd=self.bench_dir)
@@ -1,5 +1,6 @@
 import os
 import subprocess
+from typing import List
 
 from .benchmark_base import UnitTestBenchmark
 from ..commons import ARTIFACTS_PATH, ASSETS_PATH
@@ -22,22 +23,25 @@ class LuceneBenchmark(UnitTestBenchmark):
             },
             True)
 
+    def build_inputs(self) -> List[str]:
+        return [self.lucene_dir, os.path.join(ASSETS_PATH, f"{self.name}.patch")]
+
     def build(self) -> None:
-        subprocess.call([
+        subprocess.check_call([
             "git",
             "checkout",
             "."
         ], cwd=self.lucene_dir)
-        subprocess.call([
+        subprocess.check_call([
             "git",
             "apply",
             os.path.join(ASSETS_PATH, "lucene.patch")
         ], cwd=self.lucene_dir)
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "testJar",
         ], cwd=self.lucene_dir)
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "copyDependencies",
         ], cwd=self.lucene_dir)
@@ -3,6 +3,7 @@
 
 import os
 import subprocess
+from typing import List
 
 from .benchmark_base import MainMethodBenchmark
 from ..commons import ARTIFACTS_PATH, ASSETS_PATH
@@ -21,8 +22,11 @@ class SCTBenchBenchmark(MainMethodBenchmark):
             {}
         )
 
+    def build_inputs(self) -> List[str]:
+        return [self.bench_dir]
+
     def build(self) -> None:
-        subprocess.call([
+        subprocess.check_call([
             "./gradlew",
             "build",
         ], cwd=self.bench_dir)
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from .benchmarks import BENCHMARKS
+from .bm_configs.benchmark_base import BenchmarkBase
+from .commons import OUTPUT_PATH, PROJECT_PATH
+from .slots import SlotAllocator
+from .utils import pin_command
+
+BUILD_STAMP_PATH = os.path.join(OUTPUT_PATH, "build-stamps")
+BUILD_LOG_PATH = os.path.join(OUTPUT_PATH, "build-logs")
+# Build outputs inside non-git source trees; they change on every build and
+# are not part of the fingerprint.
+OUTPUT_DIRS = {".git", ".gradle", "build", "target", "outputs"}
+
+
+def git_output(path: str, args: List[str]) -> Optional[bytes]:
+    try:
+        return subprocess.run(["git", "-C", path, *args], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def tree_fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+    # A checkout of its own (the benchmark submodules) is identified by HEAD
+    # plus the uncommitted changes, which include the applied patch.
+    toplevel = git_output(path, ["rev-parse", "--show-toplevel"])
+    if toplevel is not None and os.path.realpath(toplevel.decode().strip()) == os.path.realpath(path):
+        digest.update(git_output(path, ["rev-parse", "HEAD"]) or b"")
+        digest.update(git_output(path, ["diff", "--binary", "HEAD"]) or b"")
+        return digest.hexdigest()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in OUTPUT_DIRS)
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            stat = os.stat(file_path)
+            digest.update(f"{os.path.relpath(file_path, path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def source_fingerprint(app: BenchmarkBase) -> Optional[str]:
+    inputs = app.build_inputs()
+    if not inputs or not all(os.path.exists(path) for path in inputs):
+        return None
+    return hashlib.sha256(json.dumps([[path, tree_fingerprint(path)] for path in inputs]).encode()).hexdigest()
+
+
+def stamp_path(name: str) -> str:
+    return os.path.join(BUILD_STAMP_PATH, f"{name}.json")
+
+
+def is_up_to_date(app: BenchmarkBase) -> bool:
+    if not os.path.exists(stamp_path(app.name)):
+        return False
+    with open(stamp_path(app.name)) as f:
+        stamp = json.load(f)
+    return stamp["fingerprint"] == source_fingerprint(app)
+
+
+def remove_stamp(app: BenchmarkBase):
+    if os.path.exists(stamp_path(app.name)):
+        os.remove(stamp_path(app.name))
+
+
+def write_stamp(app: BenchmarkBase):
+    # Taken after the build, since building applies the benchmark's patch.
+    fingerprint = source_fingerprint(app)
+    if fingerprint is None:
+        return
+    os.makedirs(BUILD_STAMP_PATH, exist_ok=True)
+    with open(stamp_path(app.name), "w") as f:
+        json.dump({"fingerprint": fingerprint, "time": time.time()}, f)
+
+
+def build_one(name: str, cpus: List[int]) -> int:
+    # Every build runs in its own process, pinned to its share of the cores
+    # and logging to its own file.
+    os.makedirs(BUILD_LOG_PATH, exist_ok=True)
+    log_path = os.path.join(BUILD_LOG_PATH, f"{name}.log")
+    command = pin_command([sys.executable, "-m", "fray_benchmark", "build", name], cpus)
+    with open(log_path, "w") as log:
+        returncode = subprocess.call(command, cwd=PROJECT_PATH, stdout=log, stderr=subprocess.STDOUT)
+    print(f"{name}: {'built' if returncode == 0 else f'failed with exit code {returncode}'} ({log_path})")
+    return returncode
+
+
+def build_all(names: List[str], cpu: int, parallel: int, force: bool) -> bool:
+    pending = []
+    for name in names:
+        app = BENCHMARKS[name]
+        if source_fingerprint(app) is None:
+            print(f"{name}: sources are missing, skipping")
+        elif not force and is_up_to_date(app):
+            print(f"{name}: up to date")
+        else:
+            pending.append(name)
+    if not pending:
+        return True
+    cpu = min(cpu, len(os.sched_getaffinity(0)))
+    parallel = max(1, min(parallel, len(pending), cpu))
+    allocator = SlotAllocator(parallel, cpu // parallel)
+
+    def build_pinned(name: str) -> int:
+        cpus = allocator.acquire()
+        try:
+            return build_one(name, cpus)
+        finally:
+            allocator.release(cpus)
+
+    with ThreadPoolExecutor(parallel) as pool:
+        returncodes = list(pool.map(build_pinned, pending))
+    return all(returncode == 0 for returncode in returncodes)
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import subprocess
+from typing import Any, Dict, List, Union
+
+from .bm_configs.benchmark_base import BenchmarkBase
+from .commons import OUTPUT_PATH
+from .objects.execution_config import RunConfig
+from .objects.job import Job
+from .utils import command_args, command_env, join_classpath, prepare_job, run_process
+
+CDS_PATH = os.path.join(OUTPUT_PATH, "cds")
+# Tools whose commands start a HotSpot JVM that can map a dynamic archive.
+# JPF runs on JDK 11 and the stats collector uses whatever `java` is on the
+# path, so they are left alone.
+CDS_TOOLS = ["fray", "java", "rr"]
+JAVA_LAUNCHER = "/bin/java"
+FRAY_LAUNCHER = "/bin/fray"
+
+
+def classpath_digest(classpaths: List[str]) -> str:
+    return hashlib.sha256(join_classpath(classpaths).encode()).hexdigest()[:16]
+
+
+def archive_path(app: BenchmarkBase, tool: str, classpaths: List[str]) -> str:
+    # One archive per benchmark, tool and classpath: every tool runs its own
+    # JDK, and the JVM only maps an archive for the classpath it was
+    # recorded with (JaConTeBe builds every test into its own directory).
+    return os.path.join(CDS_PATH, f"{app.name}-{tool}-{classpath_digest(classpaths)}.jsa")
+
+
+def job_classpaths(job: Job) -> List[str]:
+    if job.config_file is not None:
+        with open(job.config_file) as f:
+            return RunConfig.from_json(f.read()).executor.classpaths
+    return RunConfig.from_json(job.config).executor.classpaths
+
+
+def jvm_index(command: List[str]) -> int:
+    for i, arg in enumerate(command):
+        if arg.endswith(JAVA_LAUNCHER) or arg.endswith(FRAY_LAUNCHER):
+            return i
+    raise ValueError(f"No JVM launcher in command: {' '.join(command)}")
+
+
+def insert_jvm_options(command: Union[List[str], Dict[str, Any]], options: List[str]) -> Union[List[str], Dict[str, Any]]:
+    if isinstance(command, dict):
+        return {**command, "command": insert_jvm_options(command["command"], options)}
+    i = jvm_index(command)
+    if command[i].endswith(FRAY_LAUNCHER):
+        options = [f"-J{option}" for option in options]
+    return command[:i + 1] + options + command[i + 1:]
+
+
+def use_archive(app: BenchmarkBase, tool: str, classpaths: List[str],
+                command: Union[List[str], Dict[str, Any]]) -> Union[List[str], Dict[str, Any]]:
+    if tool not in CDS_TOOLS:
+        return command
+    archive = archive_path(app, tool, classpaths)
+    if not os.path.exists(archive):
+        return command
+    return insert_jvm_options(command, [f"-XX:SharedArchiveFile={archive}"])
+
+
+def dump_archive(app: BenchmarkBase, job: Job) -> str:
+    # Run the JVM part of the job once (without time/timeout/rr wrappers)
+    # and let it write the classes it loaded to the archive on exit.
+    archive = archive_path(app, job.tool, job_classpaths(job))
+    os.makedirs(CDS_PATH, exist_ok=True)
+    command = command_args(job.command)
+    command = command[jvm_index(command):]
+    command = insert_jvm_options(command, [f"-XX:ArchiveClassesAtExit={archive}"])
+    print(f"Creating {archive}")
+    prepare_job(job)
+    with open(os.path.splitext(archive)[0] + ".log", "w") as log:
+        result = run_process(command, cwd=job.cwd, stdout=log, stderr=subprocess.STDOUT, env=command_env(job.command),
+                             timeout=job.timeout)
+    if not os.path.exists(archive):
+        raise RuntimeError(f"JVM did not create {archive} ({result.reason}, exit code {result.returncode})")
+    return archive
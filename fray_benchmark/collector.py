@@ -0,0 +1,91 @@
+import json
+import os
+import string
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .bm_configs.benchmark_base import BenchmarkBase
+from .commons import ASSETS_PATH, FRAY_PATH, OUTPUT_PATH
+
+COLLECTOR_PATH = os.path.join(OUTPUT_PATH, "collector")
+# Statuses the junit-analyzer records for tests that passed. JUnit 3 tests
+# outside the JUnit platform only report that they finished.
+PASSED = {"SUCCESSFUL", "FINISHED"}
+
+
+def shard_filter(shard: int, shards: int) -> Optional[str]:
+    # Shards split the scanned test classes by the first letter of their
+    # simple name; shard 0 also takes names that do not start with a letter.
+    # The filter is passed as --exclude-classname, so the launcher's default
+    # test class pattern still applies.
+    if shards <= 1:
+        return None
+    mine = string.ascii_uppercase[shard::shards]
+    if shard == 0:
+        others = "".join(c + c.lower() for c in string.ascii_uppercase if c not in mine)
+        return rf"^(?:.*\.)?[{others}][^.]*$"
+    return rf"^(?:.*\.)?[^{mine}{mine.lower()}][^.]*$"
+
+
+def read_records(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A killed shard may leave a partially written last line.
+                continue
+    return records
+
+
+def merge_records(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    # JUnit 3 tests run through the vintage engine are reported twice: once
+    # by TestCase.run and once by the platform listener.
+    tests: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        name = record["test"]
+        if name not in tests:
+            tests[name] = {"status": record["status"], "threads": record["threads"], "duration": record["duration"]}
+            continue
+        test = tests[name]
+        if record["status"] not in PASSED:
+            test["status"] = record["status"]
+        test["threads"] = max(test["threads"], record["threads"])
+        test["duration"] = max(test["duration"], record["duration"])
+    return dict(sorted(tests.items()))
+
+
+def run_shard(app: BenchmarkBase, out_dir: str, shard: int, shards: int) -> List[Dict[str, Any]]:
+    output_path = os.path.join(out_dir, f"shard-{shard}.jsonl")
+    command = app.generate_collector_command(output_path, shard_filter(shard, shards))
+    with open(os.path.join(out_dir, f"shard-{shard}.log"), "w") as log:
+        log.write(" ".join(command) + "\n")
+        log.flush()
+        subprocess.call(command, cwd=FRAY_PATH, stdout=log, stderr=subprocess.STDOUT)
+    return read_records(output_path)
+
+
+def collect_tests(app: BenchmarkBase, shards: int) -> Dict[str, Dict[str, Any]]:
+    out_dir = os.path.join(COLLECTOR_PATH, app.name)
+    os.makedirs(out_dir, exist_ok=True)
+    with ThreadPoolExecutor(shards) as pool:
+        results = pool.map(lambda shard: run_shard(app, out_dir, shard, shards), range(shards))
+        records = [record for shard_records in results for record in shard_records]
+    return merge_records(records)
+
+
+def write_full_list(name: str, tests: Dict[str, Dict[str, Any]]) -> str:
+    # Concurrency tests are the passing tests that started a thread. Their
+    # metadata goes next to the list, e.g. to schedule long tests first.
+    concurrent = {test: data for test, data in tests.items() if data["status"] in PASSED and data["threads"] > 0}
+    path = os.path.join(ASSETS_PATH, f"{name}.full.txt")
+    with open(path, "w") as f:
+        f.writelines(f"{test}\n" for test in concurrent)
+    with open(os.path.join(ASSETS_PATH, f"{name}.full.json"), "w") as f:
+        json.dump(concurrent, f, indent=2)
+    print(f"{len(concurrent)} of {len(tests)} tests are concurrency tests, written to {path}")
+    return path
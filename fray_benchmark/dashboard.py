@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+from typing import Dict, List
+
+from .history import RuntimeHistory
+from .objects.job import Job
+
+# Without a terminal the status is printed as plain lines, less often.
+TTY_INTERVAL = 1
+LOG_INTERVAL = 30
+
+
+def bug_found(job: Job) -> bool:
+    report_path = os.path.join(job.log_path, "report.txt")
+    if not os.path.exists(report_path):
+        return False
+    with open(report_path) as f:
+        return f.readline().startswith("Error Found")
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressDashboard:
+    def __init__(self, pending: List[Job], history: RuntimeHistory, cpu: int, stream=sys.stderr) -> None:
+        self.pending = pending
+        self.history = history
+        self.cpu = max(cpu, 1)
+        self.stream = stream
+        self.tty = stream.isatty()
+        self.running: Dict[str, float] = {}
+        self.running_jobs: Dict[str, Job] = {}
+        self.done = 0
+        self.bugs = 0
+        self.start_time = time.time()
+        self.last_refresh = 0.0
+
+    def message(self, text: str):
+        # Log lines go above the status line instead of into it.
+        if self.tty:
+            self.stream.write("\r\033[K")
+        self.stream.write(text + "\n")
+        if self.tty:
+            self.stream.write(self.status())
+        self.stream.flush()
+
+    def started(self, job: Job):
+        self.running[job.log_path] = time.time()
+        self.running_jobs[job.log_path] = job
+        self.message(f"Running {job.log_path}" + (f" ({job.trials} trials)" if job.trials > 1 else ""))
+
+    def finished(self, job: Job):
+        del self.running[job.log_path]
+        del self.running_jobs[job.log_path]
+        self.done += 1
+        if bug_found(job):
+            self.bugs += 1
+        self.refresh(force=True)
+
+    def eta(self) -> float:
+        now = time.time()
+        remaining = sum(self.history.expected(job) for job in self.pending)
+        for log_path, started in self.running.items():
+            remaining += max(self.history.expected(self.running_jobs[log_path]) - (now - started), 0)
+        return remaining / self.cpu
+
+    def status(self) -> str:
+        return (f"[{format_duration(time.time() - self.start_time)}] running: {len(self.running)}, "
+                f"queued: {len(self.pending)}, done: {self.done}, bugs found: {self.bugs}, "
+                f"ETA: {format_duration(self.eta())}")
+
+    def refresh(self, force: bool = False):
+        now = time.time()
+        if now - self.last_refresh < (TTY_INTERVAL if self.tty else LOG_INTERVAL) and not (force and self.tty):
+            return
+        self.last_refresh = now
+        if self.tty:
+            self.stream.write("\r\033[K" + self.status())
+        else:
+            self.stream.write(self.status() + "\n")
+        self.stream.flush()
+
+    def close(self):
+        if self.tty:
+            self.stream.write("\r\033[K")
+        self.stream.write(self.status() + "\n")
+        self.stream.flush()
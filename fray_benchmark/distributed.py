@@ -0,0 +1,284 @@
+import hmac
+import json
+import os
+import queue
+import shutil
+import socket
+import socketserver
+import tarfile
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from .bm_configs.benchmark_base import JUNIT_BATCH_PATH
+from .commons import PROJECT_PATH
+from .objects.job import Job
+from .slots import SlotAllocator
+from .utils import prepare_job, remove_file, run_job
+
+# Wire format: every message is one JSON header line followed by `size`
+# bytes of payload. Payloads are gzipped tarballs of a job directory.
+CHUNK_SIZE = 1 << 20
+SPOOL_SIZE = 16 << 20
+CONNECT_RETRIES = 60
+# Shared secret of a coordinator and its workers. Workers run whatever
+# command lines the coordinator sends, so both sides check it on every
+# message. It travels in clear text: use a trusted network or a tunnel.
+TOKEN_ENV = "FRAY_BENCHMARK_TOKEN"
+# Files that record the command line and therefore contain worker paths.
+COMMAND_FILES = ["command.txt", "command.json"]
+# The job's config.json, which holds coordinator paths as well.
+CONFIG_NAME = "config.json"
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def send_message(stream: BinaryIO, header: Dict[str, Any], payload: Optional[BinaryIO] = None, size: int = 0):
+    stream.write((json.dumps({**header, "size": size}) + "\n").encode())
+    if payload is not None:
+        shutil.copyfileobj(payload, stream, CHUNK_SIZE)
+    stream.flush()
+
+
+def recv_message(stream: BinaryIO) -> Tuple[Dict[str, Any], BinaryIO]:
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Connection closed")
+    header = json.loads(line)
+    payload = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    remaining = header["size"]
+    while remaining > 0:
+        chunk = stream.read(min(remaining, CHUNK_SIZE))
+        if not chunk:
+            raise ConnectionError("Connection closed in the middle of a payload")
+        payload.write(chunk)
+        remaining -= len(chunk)
+    payload.seek(0)
+    return header, payload
+
+
+def pack_dir(path: str) -> Tuple[BinaryIO, int]:
+    payload = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    with tarfile.open(fileobj=payload, mode="w:gz") as tar:
+        tar.add(path, arcname=".")
+    size = payload.tell()
+    payload.seek(0)
+    return payload, size
+
+
+def unpack_dir(payload: BinaryIO, path: str):
+    os.makedirs(path, exist_ok=True)
+    with tarfile.open(fileobj=payload, mode="r:gz") as tar:
+        tar.extractall(path, filter="data")
+
+
+def relocate(value: Any, mapping: List[Tuple[str, str]]) -> Any:
+    if isinstance(value, str):
+        for old, new in mapping:
+            value = value.replace(old, new)
+        return value
+    if isinstance(value, list):
+        return [relocate(item, mapping) for item in value]
+    if isinstance(value, dict):
+        return {key: relocate(item, mapping) for key, item in value.items()}
+    return value
+
+
+def config_strings(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list):
+        return [string for item in value for string in config_strings(item)]
+    if isinstance(value, dict):
+        return [string for item in value.values() for string in config_strings(item)]
+    return []
+
+
+def read_shared_files(command: Any, config_path: str) -> Dict[str, str]:
+    # JVM @argfiles and JUnit batch lists live outside the job directory and
+    # are sent along with the job. Java and batched Fray jobs only name them
+    # in config.json.
+    args = command["command"] if isinstance(command, dict) else command
+    if os.path.isfile(config_path):
+        with open(config_path) as f:
+            args = args + config_strings(json.load(f))
+    files = {}
+    for arg in args:
+        path = arg[1:] if arg.startswith("@") else arg
+        if (arg.startswith("@") or path.startswith(JUNIT_BATCH_PATH)) and os.path.isfile(path):
+            with open(path) as f:
+                files[path] = f.read()
+    return files
+
+
+def relocate_config(path: str, mapping: List[Tuple[str, str]]):
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        config = json.load(f)
+    with open(path, "w") as f:
+        json.dump(relocate(config, mapping), f, indent=4)
+
+
+def check_token(header: Dict[str, Any], token: str) -> bool:
+    return hmac.compare_digest(str(header.get("token", "")).encode(), token.encode())
+
+
+def write_shared_files(files: Dict[str, str], mapping: List[Tuple[str, str]]):
+    for path, content in files.items():
+        path = relocate(path, mapping)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(relocate(content, mapping))
+        os.replace(tmp_path, path)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class Coordinator:
+    # Drop-in replacement for the local pool in run_jobs: submitted jobs are
+    # handed to whichever worker connection asks next, and the job
+    # directory is sent back and unpacked at its original location.
+    def __init__(self, address: Tuple[str, int], token: str) -> None:
+        self.token = token
+        self.jobs: queue.Queue = queue.Queue()
+        self.closing = threading.Event()
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                coordinator.serve_worker(self.rfile, self.wfile)
+
+        self.server = _Server(address, Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Coordinator listening on {address[0]}:{self.server.server_address[1]}")
+
+    def submit(self, job: Job, callback: Callable, error_callback: Callable):
+        self.jobs.put((job, callback, error_callback))
+
+    def next_job(self):
+        while not self.closing.is_set():
+            try:
+                return self.jobs.get(timeout=0.5)
+            except queue.Empty:
+                pass
+        return None
+
+    def serve_worker(self, rfile: BinaryIO, wfile: BinaryIO):
+        while True:
+            try:
+                header, _ = recv_message(rfile)
+            except (ConnectionError, OSError, ValueError):
+                return
+            if not check_token(header, self.token):
+                print("Rejected a worker with a wrong token")
+                return
+            item = self.next_job()
+            if item is None:
+                send_message(wfile, {"type": "done", "token": self.token})
+                return
+            job, callback, error_callback = item
+            try:
+                # Job directories are only created when the job starts; the
+                # config goes to the worker inside the directory.
+                prepare_job(job)
+                payload, size = pack_dir(job.log_path)
+                spec = {**asdict(job), "config": None, "config_file": None}
+                files = read_shared_files(job.command, os.path.join(job.log_path, CONFIG_NAME))
+                send_message(wfile, {"type": "job", "token": self.token, "job": spec, "project_path": PROJECT_PATH,
+                                     "files": files}, payload, size)
+                header, payload = recv_message(rfile)
+                if not check_token(header, self.token):
+                    raise ConnectionError("Wrong token")
+            except (ConnectionError, OSError, ValueError):
+                print(f"Worker disconnected, requeueing {job.log_path}")
+                self.jobs.put(item)
+                return
+            unpack_dir(payload, job.log_path)
+            if header["type"] == "error":
+                error_callback(RuntimeError(f"{job.log_path}: {header['error']}"))
+            else:
+                job.returncode = header["returncode"]
+                job.peak_rss = header["peak_rss"]
+                callback(job)
+
+    def close(self):
+        self.closing.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def connect(address: Tuple[str, int], retries: int = CONNECT_RETRIES) -> socket.socket:
+    # Workers may be started before the coordinator is listening.
+    for _ in range(retries - 1):
+        try:
+            return socket.create_connection(address)
+        except ConnectionRefusedError:
+            time.sleep(1)
+    return socket.create_connection(address)
+
+
+def worker_loop(address: Tuple[str, int], work_dir: str, cpus: List[int], token: str):
+    with connect(address) as sock:
+        rfile = sock.makefile("rb")
+        wfile = sock.makefile("wb")
+        while True:
+            send_message(wfile, {"type": "next", "token": token})
+            header, payload = recv_message(rfile)
+            if not check_token(header, token):
+                raise ConnectionError(f"{address[0]}:{address[1]} did not send the shared token")
+            if header["type"] == "done":
+                return
+            job = Job(**header["job"])
+            local_path = tempfile.mkdtemp(dir=work_dir)
+            unpack_dir(payload, local_path)
+            # Paths inside the command refer to the coordinator checkout.
+            remote_path = job.log_path
+            mapping = [(remote_path, local_path), (header["project_path"], PROJECT_PATH)]
+            job.command = relocate(job.command, mapping)
+            relocate_config(os.path.join(local_path, CONFIG_NAME), mapping)
+            write_shared_files(header.get("files", {}), mapping)
+            job.cwd = relocate(job.cwd, mapping)
+            job.log_path = local_path
+            job.cpus = cpus
+            try:
+                run_job(job)
+                reply = {"type": "result", "token": token, "returncode": job.returncode, "peak_rss": job.peak_rss}
+            except Exception as e:
+                reply = {"type": "error", "token": token, "error": repr(e)}
+            for name in COMMAND_FILES:
+                command_path = os.path.join(local_path, name)
+                if os.path.exists(command_path):
+                    with open(command_path) as f:
+                        content = f.read()
+                    with open(command_path, "w") as f:
+                        f.write(content.replace(local_path, remote_path))
+            # The coordinator keeps its own config.json, which may be linked
+            # to a test plan; unpacking ours would write through the link.
+            remove_file(os.path.join(local_path, CONFIG_NAME))
+            payload, size = pack_dir(local_path)
+            send_message(wfile, reply, payload, size)
+            shutil.rmtree(local_path)
+
+
+def run_worker(address: Tuple[str, int], slots: int, work_dir: str, token: str,
+               allocator: Optional[SlotAllocator] = None):
+    os.makedirs(work_dir, exist_ok=True)
+    threads = []
+    for _ in range(slots):
+        cpus = allocator.acquire() if allocator is not None else []
+        thread = threading.Thread(target=worker_loop, args=(address, work_dir, cpus, token))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
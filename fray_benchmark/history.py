@@ -0,0 +1,206 @@
+import fcntl
+import heapq
+import json
+import os
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .commons import OUTPUT_PATH
+from .objects.job import Job
+
+HISTORY_PATH = os.path.join(OUTPUT_PATH, "runtime-history.json")
+HISTORY_SAMPLES = 10
+# Per experiment, in output/<name>/results: the report.txt mtime of every run
+# already counted, so that ingesting the same output again does not add its
+# runs twice.
+INGEST_NAME = "history-ingest.json"
+# Head room added on top of the largest peak RSS seen for a test.
+MEMORY_MARGIN = 1.25
+
+REAL_TIME_PATTERN = re.compile(r"real (\d+(?:\.\d+)?)")
+REPORT_TIME_PATTERN = re.compile(r"^[A-Za-z ]+: (\d+(?:\.\d+)?)")
+
+
+def read_duration(log_path: str) -> Optional[float]:
+    # time.txt is written by the `time -p` prefix and is the most accurate
+    # source; report.txt is written by every runner as a fallback.
+    time_path = os.path.join(log_path, "time.txt")
+    if os.path.exists(time_path):
+        with open(time_path) as f:
+            match = REAL_TIME_PATTERN.search(f.read())
+            if match:
+                return float(match.group(1))
+    report_path = os.path.join(log_path, "report.txt")
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            match = REPORT_TIME_PATTERN.search(f.readline())
+            if match:
+                return float(match.group(1))
+    return None
+
+
+def experiment_dir(log_path: str) -> str:
+    # <name>/<app>/<technique>/iter-<n>/<index>
+    path = os.path.abspath(log_path)
+    for _ in range(4):
+        path = os.path.dirname(path)
+    return path
+
+
+def read_json(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path: str, data: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def locked(path: str) -> Iterator[None]:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+class RuntimeHistory:
+    # Experiments running at the same time share the history file; save()
+    # merges the samples recorded since the last save into the file on disk.
+    def __init__(self, path: str = HISTORY_PATH) -> None:
+        self.path = path
+        data = read_json(path)
+        self.samples: Dict[str, List[float]] = data.get("durations", {})
+        self.peak_rss: Dict[str, List[int]] = data.get("peak_rss", {})
+        self.new_samples: Dict[str, List[float]] = {}
+        self.new_peak_rss: Dict[str, List[int]] = {}
+        # Experiment directory -> run directory -> report.txt mtime.
+        self.recorded: Dict[str, Dict[str, float]] = {}
+        self.new_recorded: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def key(job: Job) -> str:
+        return f"{job.benchmark}/{job.technique}/{job.index}"
+
+    def expected(self, job: Job) -> float:
+        samples = self.samples.get(self.key(job))
+        if not samples:
+            # Unknown tests are assumed to use their whole budget so that
+            # they are scheduled early.
+            return float(job.timeout)
+        return sum(samples) / len(samples)
+
+    def expected_memory(self, job: Job) -> int:
+        samples = self.peak_rss.get(self.key(job))
+        if not samples:
+            return job.memory
+        return int(max(samples) / 1024 * MEMORY_MARGIN)
+
+    @staticmethod
+    def add_sample(samples: Dict[str, List[Any]], key: str, value: Any):
+        values = samples.setdefault(key, [])
+        values.append(value)
+        del values[:-HISTORY_SAMPLES]
+
+    def record(self, job: Job, duration: float):
+        self.add_sample(self.samples, self.key(job), duration)
+        self.new_samples.setdefault(self.key(job), []).append(duration)
+
+    def record_memory(self, job: Job, peak_rss: int):
+        self.add_sample(self.peak_rss, self.key(job), peak_rss)
+        self.new_peak_rss.setdefault(self.key(job), []).append(peak_rss)
+
+    @staticmethod
+    def ingest_path(experiment: str) -> str:
+        return os.path.join(experiment, "results", INGEST_NAME)
+
+    def recorded_runs(self, experiment: str) -> Dict[str, float]:
+        if experiment not in self.recorded:
+            self.recorded[experiment] = read_json(self.ingest_path(experiment))
+        return self.recorded[experiment]
+
+    def is_recorded(self, log_path: str) -> bool:
+        report_path = os.path.join(log_path, "report.txt")
+        experiment = experiment_dir(log_path)
+        run = os.path.relpath(os.path.abspath(log_path), experiment)
+        return os.path.exists(report_path) and \
+            self.recorded_runs(experiment).get(run) == os.path.getmtime(report_path)
+
+    def mark_recorded(self, log_path: str):
+        report_path = os.path.join(log_path, "report.txt")
+        if not os.path.exists(report_path):
+            return
+        experiment = experiment_dir(log_path)
+        run = os.path.relpath(os.path.abspath(log_path), experiment)
+        mtime = os.path.getmtime(report_path)
+        self.recorded_runs(experiment)[run] = mtime
+        self.new_recorded.setdefault(experiment, {})[run] = mtime
+
+    def record_job(self, job: Job) -> Optional[float]:
+        duration = read_duration(job.log_path)
+        if duration is not None:
+            self.record(job, duration)
+            self.mark_recorded(job.log_path)
+        if job.peak_rss > 0:
+            self.record_memory(job, job.peak_rss)
+        return duration
+
+    def ingest(self, root: str = OUTPUT_PATH) -> int:
+        # Layout: <root>/<name>/<app>/<technique>/iter-<n>/<index>
+        count = 0
+        for dirpath, _, filenames in os.walk(root):
+            if "report.txt" not in filenames:
+                continue
+            components = dirpath.split(os.sep)
+            if len(components) < 4 or not components[-2].startswith("iter-"):
+                continue
+            if self.is_recorded(dirpath):
+                continue
+            duration = read_duration(dirpath)
+            if duration is None:
+                continue
+            job = Job("", [], dirpath, "", 0, components[-4], components[-3], components[-1])
+            self.record(job, duration)
+            self.mark_recorded(dirpath)
+            count += 1
+        return count
+
+    def save(self):
+        with locked(self.path):
+            data = read_json(self.path)
+            self.samples = data.get("durations", {})
+            self.peak_rss = data.get("peak_rss", {})
+            for samples, new_samples in [(self.samples, self.new_samples), (self.peak_rss, self.new_peak_rss)]:
+                for key, values in new_samples.items():
+                    for value in values:
+                        self.add_sample(samples, key, value)
+                new_samples.clear()
+            write_json(self.path, {"durations": self.samples, "peak_rss": self.peak_rss})
+            for experiment, runs in self.new_recorded.items():
+                recorded = read_json(self.ingest_path(experiment))
+                recorded.update(runs)
+                write_json(self.ingest_path(experiment), recorded)
+                self.recorded[experiment] = recorded
+            self.new_recorded.clear()
+
+
+def order_jobs(jobs: List[Job], history: RuntimeHistory) -> List[Job]:
+    # Longest-expected-job-first list scheduling: the long jobs start first
+    # and short jobs fill the remaining cores around them.
+    return sorted(jobs, key=history.expected, reverse=True)
+
+
+def predict_makespan(jobs: List[Job], history: RuntimeHistory, cpu: int) -> float:
+    # Simulate the pool handing each job, in order, to the first free worker.
+    workers = [0.0] * max(cpu, 1)
+    for job in jobs:
+        start = heapq.heappop(workers)
+        heapq.heappush(workers, start + history.expected(job))
+    return max(workers)
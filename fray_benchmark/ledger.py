@@ -0,0 +1,88 @@
+import json
+import os
+import time
+from dataclasses import asdict
+from typing import Dict, Iterable
+
+from .objects.job import Job
+
+LEDGER_NAME = "ledger.jsonl"
+# Specs of the jobs submitted for the experiment, next to the ledger; the
+# last line of a job is its current spec.
+JOBS_NAME = "jobs.jsonl"
+
+STARTED = "started"
+FINISHED = "finished"
+FAILED = "failed"
+# Not run because the adaptive mode had enough trials of the test.
+SKIPPED = "skipped"
+# States of jobs that a resumed run does not start again.
+TERMINAL_STATES = {FINISHED, SKIPPED}
+
+
+class JobLedger:
+    # Append-only journal of job state transitions for one experiment
+    # (output/<name>/ledger.jsonl). Only the scheduling process writes to it.
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, LEDGER_NAME)
+        self.states: Dict[str, str] = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash may leave a partially written last line.
+                        continue
+                    self.states[entry["job"]] = entry["state"]
+        # The last spec written for every job; a spec is only written again
+        # when the job changed, so resuming does not repeat the job list.
+        self.specs_path = os.path.join(self.root, JOBS_NAME)
+        self.specs: Dict[str, str] = {}
+        if os.path.exists(self.specs_path):
+            with open(self.specs_path) as f:
+                for line in f:
+                    try:
+                        spec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.specs[self.job_id(Job(**spec))] = line.rstrip("\n")
+        os.makedirs(self.root, exist_ok=True)
+        self.file = open(self.path, "a")
+
+    def job_id(self, job: Job) -> str:
+        return os.path.relpath(os.path.abspath(job.log_path), self.root)
+
+    def is_finished(self, job: Job) -> bool:
+        return self.states.get(self.job_id(job)) in TERMINAL_STATES
+
+    def record_specs(self, jobs: Iterable[Job]):
+        # One line per job with everything needed to run it, written in a
+        # single pass instead of a config file per job up front.
+        lines = []
+        for job in jobs:
+            job_id = self.job_id(job)
+            line = json.dumps(asdict(job))
+            if self.specs.get(job_id) != line:
+                self.specs[job_id] = line
+                lines.append(line + "\n")
+        if lines:
+            with open(self.specs_path, "a") as f:
+                f.writelines(lines)
+
+    def record(self, job: Job, state: str, **extra):
+        job_id = self.job_id(job)
+        self.states[job_id] = state
+        self.file.write(json.dumps({"job": job_id, "state": state, "time": time.time(), **extra}) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self) -> "JobLedger":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
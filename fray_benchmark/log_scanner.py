@@ -0,0 +1,175 @@
+import mmap
+import os
+import re
+from typing import Any, Dict, Optional, Tuple
+
+FRAY_ERROR_PATTERN = re.compile(rb"Error found at iter: (\d+).+Elapsed time: (\d+)")
+FRAY_TOTAL_ITER_MARKER = b"Run finished. Total iter: "
+FRAY_TOTAL_ITER_PATTERN = re.compile(rb"Run finished. Total iter: (\d+)")
+# Patterns match within one line, as they did on split lines.
+JPF_TIME_PATTERN = re.compile(rb"ms time:[^\S\n]+(\d+)")
+JPF_ITER_PATTERN = re.compile(rb",end=(\d+)")
+# Per-job summary written by the runners next to the tool's log.
+RESULT_NAME = "result.json"
+# Exception header after the first bug report, e.g. "java.lang.AssertionError: msg".
+BUG_MARKERS = [b"Error found", b"==== error"]
+EXCEPTION_PATTERN = re.compile(rb"((?:[\w$]+\.)+[\w$]*(?:Exception|Error)\b[^\n]*)")
+SIGNATURE_WINDOW = 1 << 16
+SIGNATURE_LENGTH = 300
+JPF_FAILURE_MARKERS = [
+    "UnsupportedOperationException",
+    "NoSuchMethodException",
+    "FileNotFoundException",
+    "Null charset name",
+    "NoSuchMethodError",
+    "JPF out of memory",
+    "java.lang.NullPointerException: Calling 'startsWith(Ljava/lang/String;)Z' on null object",
+]
+
+
+class LogView:
+    # Read-only, mmap-backed view of a log file. `text in view` searches the
+    # file without reading it into memory, so it can be handed to the bug
+    # classifiers in place of the log text.
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size > 0:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b""
+
+    def __contains__(self, text: str) -> bool:
+        return self.data.find(text.encode()) != -1
+
+    def line_start(self, pos: int) -> int:
+        return self.data.rfind(b"\n", 0, pos) + 1
+
+    def line_end(self, pos: int) -> int:
+        end = self.data.find(b"\n", pos)
+        return len(self.data) if end == -1 else end
+
+    def last_line_with_prefix(self, prefix: bytes, end: int) -> int:
+        # Start of the last line before `end` that starts with prefix after
+        # leading whitespace, or -1. Seeks backwards from the end of the file.
+        pos = self.data.rfind(prefix, 0, end)
+        while pos != -1:
+            start = self.line_start(pos)
+            if not self.data[start:pos].strip():
+                return start
+            pos = self.data.rfind(prefix, 0, start)
+        return -1
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self) -> "LogView":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def fray_total_iterations(view: LogView) -> int:
+    # The last "Starting iteration N" line or "Run finished. Total iter: N",
+    # whichever comes later; both are found by seeking back from the end.
+    starting = view.data.rfind(b"\nStarting iteration") + 1
+    if starting == 0 and view.data[:len(b"Starting iteration")] != b"Starting iteration":
+        starting = -1
+    finished = None
+    pos = view.data.rfind(FRAY_TOTAL_ITER_MARKER)
+    while pos != -1 and finished is None:
+        finished = FRAY_TOTAL_ITER_PATTERN.match(view.data, pos)
+        pos = view.data.rfind(FRAY_TOTAL_ITER_MARKER, 0, pos)
+    if finished is not None and view.line_start(finished.start()) > starting:
+        return int(finished.group(1))
+    if starting >= 0:
+        line = view.data[starting:view.line_end(starting)]
+        return int(line.split(b" ")[-1].strip()) + 1
+    return -1
+
+
+def scan_fray_log(view: LogView) -> Tuple[int, int, int]:
+    # (total iterations, iteration of the first bug, its elapsed time) from
+    # a Fray, RR or Java log; -1 when absent. The iteration is as logged.
+    first_bug_iter = -1
+    first_bug_time = -1
+    match = FRAY_ERROR_PATTERN.search(view.data)
+    if match:
+        first_bug_iter, first_bug_time = int(match.group(1)), int(match.group(2))
+    return fray_total_iterations(view), first_bug_iter, first_bug_time
+
+
+def scan_jpf_log(view: LogView) -> Tuple[int, int, int, bool]:
+    # (paths explored, iteration of the first error, its time, whether JPF
+    # itself failed) from a JPF log.
+    total_iteration = -1
+    paths = view.last_line_with_prefix(b"paths =", len(view.data))
+    if paths != -1:
+        total_iteration = int(view.data[paths:view.line_end(paths)].split(b"=")[-1].strip())
+    first_bug_iter = -1
+    end = len(view.data)
+    match = JPF_ITER_PATTERN.search(view.data)
+    if match:
+        first_bug_iter = int(match.group(1)) + 1
+        end = view.line_end(match.start())
+    # The time is the last one reported up to the first error, counting only
+    # the first on every line.
+    first_bug_time = -1
+    last_line = -1
+    for time_match in JPF_TIME_PATTERN.finditer(view.data, 0, end):
+        line = view.line_start(time_match.start())
+        if line != last_line:
+            first_bug_time = int(time_match.group(1))
+            last_line = line
+    failed = any(marker in view for marker in JPF_FAILURE_MARKERS)
+    return total_iteration, first_bug_iter, first_bug_time, failed
+
+
+
+def tool_log(run_folder: str, tool: str) -> str:
+    if tool == "rr" or tool == "jpf":
+        return os.path.join(run_folder, "stdout.txt")
+    return os.path.join(run_folder, "report", "fray.log")
+
+
+def bug_signature(view: LogView) -> Optional[str]:
+    # The first exception logged after the first bug report: its class and
+    # message, which identify the bug across runs.
+    found = [pos for pos in (view.data.find(marker) for marker in BUG_MARKERS) if pos != -1]
+    if not found:
+        return None
+    end = view.line_end(min(found))
+    match = EXCEPTION_PATTERN.search(view.data, end, min(len(view.data), end + SIGNATURE_WINDOW))
+    if match is None:
+        return None
+    return match.group(1).decode(errors="replace").strip()[:SIGNATURE_LENGTH]
+
+
+def scan_result(path: str, tool: str) -> Dict[str, Any]:
+    # Result fields of a tool log, None when absent. Iterations are 1-based
+    # for all tools.
+    result: Dict[str, Any] = {
+        "iterations": None,
+        "first_bug_iter": None,
+        "first_bug_time": None,
+        "run_failed": False,
+        "bug_reported": False,
+        "bug_signature": None,
+    }
+    if not os.path.exists(path):
+        return result
+    with LogView(path) as view:
+        if tool == "jpf":
+            iterations, first_bug_iter, first_bug_time, result["run_failed"] = scan_jpf_log(view)
+        else:
+            iterations, first_bug_iter, first_bug_time = scan_fray_log(view)
+            if first_bug_iter != -1 and tool != "rr":
+                first_bug_iter += 1
+        result["bug_reported"] = "Error found" in view
+        result["bug_signature"] = bug_signature(view)
+    for key, value in [("iterations", iterations), ("first_bug_iter", first_bug_iter),
+                       ("first_bug_time", first_bug_time)]:
+        result[key] = None if value == -1 else value
+    return result
@@ -0,0 +1,32 @@
+import json
+from typing import List, Optional
+from dataclasses import dataclass, field
+
+
+@dataclass
+class CampaignEntry:
+    tools: List[str]
+    applications: List[str]
+    schedulers: List[str] = field(default_factory=list)
+    iterations: Optional[int] = None
+    timeout: Optional[int] = None
+    perf_mode: Optional[bool] = None
+    batch_size: Optional[int] = None
+    trials_per_process: Optional[int] = None
+
+
+@dataclass
+class Campaign:
+    name: str
+    runs: List[CampaignEntry]
+    iterations: int = 1
+    timeout: int = 60 * 10
+    perf_mode: bool = False
+    batch_size: int = 1
+    trials_per_process: int = 1
+
+    @classmethod
+    def from_json(cls, json_str: str):
+        data = json.loads(json_str)
+        runs = [CampaignEntry(**entry) for entry in data.pop('runs')]
+        return cls(runs=runs, **data)
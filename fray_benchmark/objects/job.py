@@ -0,0 +1,52 @@
+from typing import List, Dict, Any, Optional, Union
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Job:
+    tool: str
+    command: Union[List[str], Dict[str, Any]]
+    log_path: str
+    cwd: str
+    timeout: int
+    benchmark: str = ""
+    technique: str = ""
+    index: str = ""
+    cpus: List[int] = field(default_factory=list)
+    # Memory budget in MB and measured peak RSS in KB.
+    memory: int = 0
+    peak_rss: int = 0
+    returncode: Optional[int] = None
+    # Number of consecutive trials (iteration directories) one Fray process
+    # runs; see run_fray_trials.
+    trials: int = 1
+    # config.json of the job: linked from config_file (a test plan entry)
+    # or written from config when the job starts.
+    config: Optional[str] = None
+    config_file: Optional[str] = None
+
+
+@dataclass
+class ProcessResult:
+    returncode: int
+    elapsed: float
+    peak_rss: int
+    # "exited", "signal:<NAME>" or "timeout:<last signal sent>".
+    reason: str = "exited"
+    # CPU seconds of the child and the descendants it waited for.
+    user_time: float = 0.0
+    sys_time: float = 0.0
+    # Whether the runner signalled the process because of its deadline.
+    timed_out: bool = False
+
+
+@dataclass
+class ProcessSpec:
+    # The process a runner starts for a job.
+    command: List[str]
+    cwd: str
+    timeout: Optional[float] = None
+    # Files stdout and stderr are written to; discarded when None.
+    stdout: Optional[str] = None
+    stderr: Optional[str] = None
+    env: Optional[Dict[str, str]] = None
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# Repeats an `rr record` command until it reproduces a bug or RR_TIMEOUT
+# expires. Usage: rr_runner.py [-e] TRACE_DIR COMMAND...
+#
+# Runs from the rr checkout, so it only uses the standard library.
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional
+
+BUG_PATTERN = re.compile(
+    r"Deadlock detected"
+    r"|Finished test: Bug has been reproduced successfully\."
+    r"|Program has been forced to exit from deadlock"
+    r"|Detected suspicious forever waiting bug"
+)
+# On NixOS, rr is only on the system profile's PATH.
+SYSTEM_PATH = "/run/current-system/sw/bin"
+TIMINGS_NAME = "iterations.jsonl"
+OUTPUT_NAME = "iteration-output.txt"
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class TraceRotator:
+    # rr refuses to record into an existing directory. Instead of deleting the
+    # previous trace before every iteration, it is renamed out of the way and
+    # removed by a background thread while the next iteration records.
+    def __init__(self, trace_dir: str) -> None:
+        self.trace_dir = trace_dir
+        self.count = 0
+        self.cleaners: List[threading.Thread] = []
+
+    def rotate(self):
+        if not os.path.exists(self.trace_dir):
+            return
+        old_dir = f"{self.trace_dir}.old-{self.count}"
+        self.count += 1
+        os.rename(self.trace_dir, old_dir)
+        cleaner = threading.Thread(target=shutil.rmtree, args=(old_dir, True), daemon=True)
+        cleaner.start()
+        self.cleaners.append(cleaner)
+
+    def join(self):
+        for cleaner in self.cleaners:
+            cleaner.join()
+
+
+def run_iteration(command: List[str], output_path: str) -> Optional[str]:
+    # Streams the child's stdout into the output file and returns the first
+    # bug marker it prints.
+    marker = None
+    with open(output_path, "w") as output:
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, errors="replace")
+        for line in proc.stdout:
+            output.write(line)
+            if marker is None:
+                match = BUG_PATTERN.search(line)
+                if match:
+                    marker = match.group(0)
+        proc.wait()
+    return marker
+
+
+def main(args: List[str]) -> int:
+    explore = False
+    if args and args[0] == "-e":
+        explore = True
+        args = args[1:]
+    trace_dir = args[0]
+    command = args[1:]
+    # Looked up by Popen and inherited by the recorded command.
+    os.environ["PATH"] = os.pathsep.join([SYSTEM_PATH, os.environ.get("PATH", "")])
+    timeout = int(os.environ.get("RR_TIMEOUT", "600"))
+    log_dir = os.path.dirname(os.path.abspath(trace_dir))
+    rotator = TraceRotator(trace_dir)
+    timings = open(os.path.join(log_dir, TIMINGS_NAME), "w")
+    exit_status = 0
+    iteration = 1
+    start_time = now_ms()
+    try:
+        while exit_status == 0 or explore:
+            print(f"Starting iteration {iteration}", flush=True)
+            rotator.rotate()
+            iteration_start = now_ms()
+            marker = run_iteration(command, os.path.join(log_dir, OUTPUT_NAME))
+            exit_status = 1 if marker is not None else 0
+            elapsed = now_ms() - start_time
+            timings.write(json.dumps({
+                "iteration": iteration,
+                "start": iteration_start - start_time,
+                "duration": now_ms() - iteration_start,
+                "bug": marker,
+            }) + "\n")
+            timings.flush()
+            if exit_status != 0:
+                print(f"Error found at iter: {iteration}, Elapsed time: {elapsed}", flush=True)
+            if elapsed >= timeout * 1000:
+                print(f"Timeout expired after {elapsed / 1000:.1f} seconds", flush=True)
+                break
+            iteration += 1
+    except KeyboardInterrupt:
+        # `timeout -s INT` stops the whole process group.
+        pass
+    finally:
+        timings.close()
+        rotator.join()
+    return exit_status
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,262 @@
+import asyncio
+import os
+import queue
+import sys
+import threading
+import time
+from multiprocessing import Pool
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from .adaptive import AdaptiveStopper, order_trials
+from .async_runner import run_job_async
+from .bm_configs.benchmark_base import BenchmarkBase
+from .cds import use_archive
+from .commons import OUTPUT_PATH, SCHEDULERS
+from .dashboard import ProgressDashboard
+from .history import RuntimeHistory, order_jobs, predict_makespan
+from .ledger import FAILED, FINISHED, SKIPPED, STARTED, JobLedger
+from .objects.campaign import Campaign
+from .objects.job import Job
+from .slots import SlotAllocator
+from .utils import exit_on_sigterm, kill_active_jobs, run_job
+
+# Finished jobs between two saves of the runtime history; it is saved once
+# more when the run ends.
+HISTORY_SAVE_INTERVAL = 50
+
+
+# Tools generate_jobs can run.
+TOOLS = ["jpf", "rr", "fray", "stat", "java"]
+
+
+def technique_name(tool: str, scheduler: str) -> str:
+    return scheduler if tool == "fray" else tool
+
+
+def iteration_dir(name: str, app: BenchmarkBase, tool: str, scheduler: str, iteration: int) -> str:
+    return os.path.join(OUTPUT_PATH, name, app.name, technique_name(tool, scheduler), f"iter-{iteration}")
+
+
+def generate_jobs(app: BenchmarkBase, tool: str, scheduler: str, out_dir: str, timeout: int, perf_mode: bool,
+                  cds: bool = False, batch_size: int = 1, trials: int = 1) -> Iterator[Job]:
+    if batch_size > 1:
+        app = app.batched(batch_size)
+    if tool == "java":
+        commands = app.generate_java_test_commands(SCHEDULERS["random"], out_dir, timeout, perf_mode)
+    elif tool == "rr":
+        commands = app.generate_rr_test_commands(out_dir, timeout, perf_mode)
+    elif tool == "jpf":
+        commands = app.generate_jpf_test_commands(out_dir, timeout, perf_mode)
+    elif tool == "stat":
+        commands = app.generate_fray_stats_collector_commands(out_dir)
+    else:
+        commands = app.generate_fray_test_commands(SCHEDULERS[scheduler], out_dir, timeout, perf_mode)
+    technique = technique_name(tool, scheduler)
+    memory = app.memory_budget(tool)
+    for command, log_path, cwd, config_data, config_file in commands:
+        if cds:
+            command = use_archive(app, tool, config_data.executor.classpaths, command)
+        yield Job(tool, command, log_path, cwd, timeout, app.name, technique, os.path.basename(log_path), memory=memory,
+                  trials=trials, config=None if config_file else config_data.to_json(), config_file=config_file)
+
+
+def trial_groups(tool: str, iterations: int, trials_per_process: int) -> List[Tuple[int, int]]:
+    # (first iteration, number of trials) of the jobs for every test. Only
+    # Fray can run several trials in one process.
+    if tool != "fray" or trials_per_process <= 1:
+        return [(i, 1) for i in range(iterations)]
+    return [(i, min(trials_per_process, iterations - i)) for i in range(0, iterations, trials_per_process)]
+
+
+def campaign_jobs(campaign: Campaign, benchmarks: Mapping[str, BenchmarkBase], cds: bool = False) -> List[Job]:
+    jobs = []
+    for entry in campaign.runs:
+        iterations = entry.iterations if entry.iterations is not None else campaign.iterations
+        timeout = entry.timeout if entry.timeout is not None else campaign.timeout
+        perf_mode = entry.perf_mode if entry.perf_mode is not None else campaign.perf_mode
+        batch_size = entry.batch_size if entry.batch_size is not None else campaign.batch_size
+        trials_per_process = entry.trials_per_process if entry.trials_per_process is not None else campaign.trials_per_process
+        for tool in entry.tools:
+            schedulers = entry.schedulers if tool == "fray" else [None]
+            for scheduler in schedulers:
+                for application in entry.applications:
+                    app = benchmarks[application]
+                    for i, trials in trial_groups(tool, iterations, trials_per_process):
+                        out_dir = iteration_dir(campaign.name, app, tool, scheduler, i)
+                        jobs.extend(generate_jobs(app, tool, scheduler, out_dir, timeout, perf_mode, cds, batch_size, trials))
+    return jobs
+
+
+def total_memory() -> int:
+    with open("/proc/meminfo") as f:
+        for line in f:
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) // 1024
+    raise RuntimeError("Cannot read MemAvailable from /proc/meminfo")
+
+
+def take_admissible(pending: List[Job], history: RuntimeHistory, free_memory: Optional[int], running: int) -> Optional[Job]:
+    # Start the first queued job that fits into the free memory. Smaller
+    # jobs further down the queue may start ahead of a large one that does
+    # not fit yet.
+    for i, job in enumerate(pending):
+        if free_memory is None or running == 0 or history.expected_memory(job) <= free_memory:
+            return pending.pop(i)
+    return None
+
+
+class PoolExecutor:
+    def __init__(self, processes: int) -> None:
+        self.pool = Pool(processes=processes, initializer=exit_on_sigterm)
+
+    def submit(self, job: Job, callback: Callable, error_callback: Callable):
+        self.pool.apply_async(run_job, (job,), callback=callback, error_callback=error_callback)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+
+class AsyncioExecutor:
+    # Drives all jobs from one event loop in this process: the jobs are
+    # asyncio subprocesses whose output is streamed to their logs, so no
+    # worker processes are forked, jobs are never pickled and no thread
+    # blocks on a job.
+    def __init__(self, concurrency: int) -> None:
+        self.loop = asyncio.new_event_loop()
+        if sys.version_info < (3, 12):
+            # The default watcher blocks a thread in waitpid per child; 3.12
+            # watches pidfds on its own.
+            watcher = asyncio.PidfdChildWatcher()
+            watcher.attach_loop(self.loop)
+            asyncio.set_child_watcher(watcher)
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def run(self, job: Job, callback: Callable, error_callback: Callable):
+        try:
+            result = await run_job_async(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error_callback(e)
+            return
+        callback(result)
+
+    def submit(self, job: Job, callback: Callable, error_callback: Callable):
+        asyncio.run_coroutine_threadsafe(self.run(job, callback, error_callback), self.loop)
+
+    async def cancel_all(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        kill_active_jobs()
+        asyncio.run_coroutine_threadsafe(self.cancel_all(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+EXECUTORS = {
+    "pool": PoolExecutor,
+    "asyncio": AsyncioExecutor,
+}
+
+
+def skip_converged(pending: List[Job], finished: Job, stopper: AdaptiveStopper, ledger: Optional[JobLedger],
+                   log: Callable[[str], None] = print):
+    if not stopper.converged(finished):
+        return
+    key = RuntimeHistory.key(finished)
+    skipped = [job for job in pending if RuntimeHistory.key(job) == key]
+    if not skipped:
+        return
+    # Update in place: the dashboard holds on to the same list.
+    pending[:] = [job for job in pending if RuntimeHistory.key(job) != key]
+    if ledger is not None:
+        for job in skipped:
+            ledger.record(job, SKIPPED)
+    log(f"Converged {key}: {stopper.summary(finished)}, skipping {len(skipped)} remaining trials")
+
+
+def run_jobs(jobs: Iterable[Job], cpu: int, slots: Optional[SlotAllocator] = None, memory_limit: Optional[int] = None,
+             ledger: Optional[JobLedger] = None, executor=None, stopper: Optional[AdaptiveStopper] = None):
+    history = RuntimeHistory()
+    jobs = list(jobs)
+    if ledger is not None:
+        ledger.record_specs(jobs)
+        finished = [job for job in jobs if ledger.is_finished(job)]
+        if finished:
+            print(f"Skipping {len(finished)} jobs already finished or skipped according to {ledger.path}")
+            jobs = [job for job in jobs if not ledger.is_finished(job)]
+            if stopper is not None:
+                for job in finished:
+                    stopper.record(job)
+    jobs = order_jobs(jobs, history)
+    if stopper is not None:
+        jobs = order_trials(jobs)
+    predicted = predict_makespan(jobs, history, cpu)
+    print(f"Scheduling {len(jobs)} jobs on {cpu} workers, predicted makespan: {predicted:.1f}s")
+    if memory_limit is not None:
+        print(f"Admitting jobs within a memory budget of {memory_limit} MB")
+    start_time = time.time()
+    # Jobs are handed to the pool one at a time, only when a worker is free,
+    # so that per-job resources (core sets, memory) are assigned at dispatch
+    # time.
+    pending = list(jobs)
+    completed = queue.Queue()
+    running = 0
+    reserved: Dict[str, int] = {}
+    dashboard = ProgressDashboard(pending, history, cpu)
+    # A caller-provided executor may serve several run_jobs calls and is
+    # closed by the caller.
+    owned_executor = PoolExecutor(cpu) if executor is None else None
+    if owned_executor is not None:
+        executor = owned_executor
+    try:
+        while pending or running:
+            while pending and running < cpu:
+                free_memory = None if memory_limit is None else memory_limit - sum(reserved.values())
+                job = take_admissible(pending, history, free_memory, running)
+                if job is None:
+                    break
+                reserved[job.log_path] = history.expected_memory(job)
+                if slots is not None:
+                    job.cpus = slots.acquire()
+                if ledger is not None:
+                    ledger.record(job, STARTED)
+                executor.submit(job, completed.put, lambda e, job=job: completed.put((job, e)))
+                dashboard.started(job)
+                running += 1
+            try:
+                result = completed.get(timeout=1)
+            except queue.Empty:
+                dashboard.refresh()
+                continue
+            if isinstance(result, tuple):
+                job, error = result
+                if ledger is not None:
+                    ledger.record(job, FAILED, error=repr(error))
+                raise error
+            running -= 1
+            if ledger is not None:
+                ledger.record(result, FINISHED, returncode=result.returncode)
+            del reserved[result.log_path]
+            if slots is not None:
+                slots.release(result.cpus)
+            history.record_job(result)
+            dashboard.finished(result)
+            if dashboard.done % HISTORY_SAVE_INTERVAL == 0:
+                history.save()
+            if stopper is not None:
+                stopper.record(result)
+                skip_converged(pending, result, stopper, ledger, dashboard.message)
+    finally:
+        history.save()
+        dashboard.close()
+        if owned_executor is not None:
+            owned_executor.close()
+    print(f"Finished {dashboard.done} jobs, predicted makespan: {predicted:.1f}s, actual makespan: {time.time() - start_time:.1f}s")
@@ -0,0 +1,62 @@
+import glob
+import os
+from typing import List
+
+
+def parse_cpulist(text: str) -> List[int]:
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpulist(cpus: List[int]) -> str:
+    return ",".join(str(cpu) for cpu in cpus)
+
+
+def numa_nodes() -> List[List[int]]:
+    available = os.sched_getaffinity(0)
+    nodes = []
+    for path in sorted(glob.glob("/sys/devices/system/node/node*/cpulist")):
+        with open(path) as f:
+            cpus = [cpu for cpu in parse_cpulist(f.read()) if cpu in available]
+        if cpus:
+            nodes.append(cpus)
+    if not nodes:
+        nodes.append(sorted(available))
+    return nodes
+
+
+class SlotAllocator:
+    def __init__(self, slots: int, cores_per_job: int = 1, numa: bool = False) -> None:
+        if numa:
+            nodes = numa_nodes()
+        else:
+            nodes = [sorted(os.sched_getaffinity(0))]
+        # Split every node into core sets so that no set crosses a node
+        # boundary, then interleave the nodes to spread concurrent jobs.
+        per_node = [
+            [node[i:i + cores_per_job] for i in range(0, len(node) - cores_per_job + 1, cores_per_job)]
+            for node in nodes
+        ]
+        core_sets = []
+        for i in range(max(map(len, per_node), default=0)):
+            for node_sets in per_node:
+                if i < len(node_sets):
+                    core_sets.append(node_sets[i])
+        if len(core_sets) < slots:
+            raise ValueError(f"Cannot pin {slots} jobs with {cores_per_job} cores each: "
+                             f"only {len(core_sets)} core sets are available")
+        self.free: List[List[int]] = core_sets[:slots]
+
+    def acquire(self) -> List[int]:
+        return self.free.pop(0)
+
+    def release(self, cpus: List[int]):
+        self.free.append(cpus)
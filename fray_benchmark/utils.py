@@ -1,92 +1,442 @@
+import hashlib
 import os
 import re
+import signal
+import sys
+import threading
 import time
 import shutil
 import json
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional, Set, Tuple, Union
+from dataclasses import replace
 import subprocess
-from .commons import PERF_TRIALS, PERF_ITER
+from .commons import OUTPUT_PATH, PERF_TRIALS, PERF_ITER
+from .log_scanner import RESULT_NAME, scan_result, tool_log
+from .objects.job import Job, ProcessResult, ProcessSpec
+from .slots import format_cpulist
 
+ARGFILE_PATH = os.path.join(OUTPUT_PATH, "argfiles")
+# The generated commands enforce the timeout themselves (`timeout`, Fray's
+# --timeout, RR_TIMEOUT); the runner deadline is only a backstop for hung
+# processes and therefore fires a little later.
+RUNNER_TIMEOUT_SLACK = 60
+TERMINATION_SIGNALS = [signal.SIGINT, signal.SIGTERM, signal.SIGKILL]
+TERMINATION_GRACE = 10
+# Process groups of the jobs running in this process.
+ACTIVE_GROUPS: Set[int] = set()
 
-def run_fray(command: Dict[str, Any], log_path: str, cwd: str, timeout: int):
-    print(f"Running {log_path}")
-    with open(os.path.join(log_path, "command.txt"), "w") as f:
-        f.write(" ".join(command))
 
-    fray_log_path = os.path.join(log_path, "report", "fray.log")
-    if os.path.exists(fray_log_path):
-        with open(fray_log_path) as f:
-            fray_log = f.read()
-            # Skip if already finished
-            if "Run finished" in fray_log or "Error found at iter" in fray_log:
-                print(f"Prior run detected, skipping: {log_path}")
+def kill_process_group(pgid: int, sig: int = signal.SIGKILL) -> bool:
+    try:
+        os.killpg(pgid, sig)
+        return True
+    except ProcessLookupError:
+        return False
+
+
+def exit_on_sigterm():
+    # Pool workers are terminated with SIGTERM; turning it into SystemExit
+    # lets run_process kill the process group it is waiting for.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(1))
+
+
+def kill_active_jobs():
+    for pgid in list(ACTIVE_GROUPS):
+        kill_process_group(pgid)
+
+
+def run_process(command: List[str], cwd: str, stdout=None, stderr=None, env=None,
+                timeout: Optional[float] = None) -> ProcessResult:
+    start_time = time.time()
+    # Every job runs in its own process group so that the deadline reaches
+    # the JVM behind the time/timeout/rr wrappers.
+    proc = subprocess.Popen(command, cwd=cwd, stdout=stdout, stderr=stderr, env=env, start_new_session=True)
+    ACTIVE_GROUPS.add(proc.pid)
+    finished = threading.Event()
+    reason = "exited"
+    timed_out = False
+
+    def supervise():
+        nonlocal reason, timed_out
+        if finished.wait(timeout):
+            return
+        for sig in TERMINATION_SIGNALS:
+            if not kill_process_group(proc.pid, sig):
+                return
+            reason = f"timeout:{sig.name}"
+            timed_out = True
+            if finished.wait(TERMINATION_GRACE):
                 return
-    error_found = False
+
+    if timeout is not None:
+        threading.Thread(target=supervise, daemon=True).start()
     try:
-        start_time = time.time()
-        proc = subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        error_found = proc.returncode != 0 and proc.returncode != 124
-    except subprocess.TimeoutExpired:
-        pass
+        # wait4 reports the peak RSS of the child and of every descendant it
+        # waited for, which covers the JVM behind the time/timeout wrappers.
+        _, status, rusage = os.wait4(proc.pid, 0)
+    except BaseException:
+        kill_process_group(proc.pid)
+        raise
+    finally:
+        finished.set()
+    # Do not leave stray processes of the job behind.
+    kill_process_group(proc.pid)
+    ACTIVE_GROUPS.discard(proc.pid)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if reason == "exited" and proc.returncode < 0:
+        reason = f"signal:{signal.Signals(-proc.returncode).name}"
+    return ProcessResult(proc.returncode, time.time() - start_time, rusage.ru_maxrss, reason,
+                         rusage.ru_utime, rusage.ru_stime, timed_out)
+
+
+def write_result(log_path: str, tool: str, result: ProcessResult):
+    # result.json: how the process ended and what its log reports, so that
+    # readers do not have to scan the log again.
+    record = {
+        "tool": tool,
+        "exit_code": result.returncode,
+        "termination": result.reason,
+        "wall_time": round(result.elapsed, 3),
+        "user_time": round(result.user_time, 3),
+        "sys_time": round(result.sys_time, 3),
+        "peak_rss": result.peak_rss,
+        "finished_at": time.time(),
+        **scan_result(tool_log(log_path, tool), tool),
+    }
+    path = os.path.join(log_path, RESULT_NAME)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(record, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def write_termination(report, result: ProcessResult):
+    report.write(f"Termination: {result.reason}\n")
+
+
+def run_spec(spec: ProcessSpec) -> ProcessResult:
+    stdout = open(spec.stdout, "w") if spec.stdout is not None else subprocess.DEVNULL
+    stderr = open(spec.stderr, "w") if spec.stderr is not None else subprocess.DEVNULL
+    try:
+        return run_process(spec.command, spec.cwd, stdout, stderr, spec.env, spec.timeout)
+    finally:
+        for f in (stdout, stderr):
+            if f is not subprocess.DEVNULL:
+                f.close()
+
+
+# A runner is split into the process it starts for a job and the report it
+# writes from the result, so that every executor can start the process its
+# own way.
+def fray_spec(command: Union[List[str], Dict[str, Any]], log_path: str, cwd: str, timeout: int) -> ProcessSpec:
+    write_command(log_path, command)
+    return ProcessSpec(command_args(command), cwd, timeout + RUNNER_TIMEOUT_SLACK, env=command_env(command))
+
+
+def write_exit_report(log_path: str, result: ProcessResult):
+    # Fray and RR exit with a non-zero code when they find a bug; a crash
+    # counts as well. Only a process the runner stopped at its deadline
+    # found nothing.
+    error_found = not result.timed_out and result.returncode != 0 and result.returncode != 124
     with open(os.path.join(log_path, "report.txt"), "w") as report:
         if error_found:
-            report.write(f"Error Found: {time.time() - start_time}\n")
+            report.write(f"Error Found: {result.elapsed}\n")
         else:
-            report.write(f"No Error: {time.time() - start_time}\n")
+            report.write(f"No Error: {result.elapsed}\n")
+        write_termination(report, result)
+
+# Fray's own log lines; --explore keeps exploring after a bug and reports
+# every bug with its iteration and the milliseconds since the run started.
+FRAY_ERROR_PATTERN = re.compile(r"Error found at iter: (\d+).+Elapsed time: (\d+)")
+FRAY_TOTAL_PATTERN = re.compile(r"Run finished. Total iter: (\d+)")
+FRAY_STARTING_PATTERN = re.compile(r"Starting iteration (\d+)")
+FRAY_ERROR_ITER_PATTERN = re.compile(r"(?<=Error found at iter: )\d+")
+FRAY_ERROR_TIME_PATTERN = re.compile(r"(?<=Elapsed time: )\d+")
+ITERATION_DIR_PATTERN = re.compile(r"^iter-(\d+)$")
+TRIAL_POLL_INTERVAL = 0.2
+
+
+def command_args(command: Union[List[str], Dict[str, Any]]) -> List[str]:
+    return command["command"] if isinstance(command, dict) else command
+
+
+def command_env(command: Union[List[str], Dict[str, Any]]) -> Optional[Dict[str, str]]:
+    # Commands given as {"command": [...], "env": {...}} run with env on top
+    # of the runner's environment.
+    if isinstance(command, dict) and command.get("env"):
+        return {**os.environ, **command["env"]}
+    return None
+
+
+def write_command(path: str, command: Union[List[str], Dict[str, Any]]):
+    with open(os.path.join(path, "command.txt"), "w") as f:
+        f.write(" ".join(command_args(command)))
+    if isinstance(command, dict):
+        with open(os.path.join(path, "command.json"), "w") as f:
+            json.dump(command, f)
+
+
+def set_option(command: List[str], flag: str, value: Optional[str] = None) -> List[str]:
+    command = list(command)
+    if flag not in command:
+        command.extend([flag] if value is None else [flag, value])
+    elif value is not None:
+        command[command.index(flag) + 1] = value
+    return command
+
+
+def trial_dirs(log_path: str, trials: int) -> List[str]:
+    # The trials of .../iter-<n>/<index> go to iter-<n>, iter-<n+1>, ...
+    iteration_dir, index = os.path.split(log_path)
+    parent, iteration = os.path.split(iteration_dir)
+    base = int(ITERATION_DIR_PATTERN.match(iteration).group(1))
+    return [os.path.join(parent, f"iter-{base + i}", index) for i in range(trials)]
+
+
+def write_trial(path: str, bug_found: bool, elapsed_ms: int, reason: str):
+    # Same files as a single-trial Fray job, so that the result readers
+    # see every trial on its own. report/fray.log follows in write_trial_log.
+    os.makedirs(os.path.join(path, "report"), exist_ok=True)
+    with open(os.path.join(path, "report.txt"), "w") as report:
+        report.write(f"{'Error Found' if bug_found else 'No Error'}: {elapsed_ms / 1000}\n")
+        report.write(f"Termination: {reason}\n")
+    with open(os.path.join(path, "time.txt"), "w") as f:
+        f.write(f"real {elapsed_ms / 1000:.2f}\n")
+
+
+def trial_log_line(line: str, first_iter: int, start_ms: int) -> str:
+    # Iterations and times relative to the trial, as in a single-trial run.
+    line = FRAY_STARTING_PATTERN.sub(lambda m: f"Starting iteration {int(m.group(1)) - first_iter}", line)
+    if FRAY_ERROR_PATTERN.search(line):
+        line = FRAY_ERROR_ITER_PATTERN.sub(lambda m: str(int(m.group(0)) - first_iter), line)
+        line = FRAY_ERROR_TIME_PATTERN.sub(lambda m: str(int(m.group(0)) - start_ms), line)
+    return line
+
+
+def write_trial_log(path: str, lines: List[str], first_iter: int, start_ms: int, iterations: int):
+    # The trial's slice of the process log, so that the bug classifiers see
+    # the test and stack frames of its bug.
+    os.makedirs(os.path.join(path, "report"), exist_ok=True)
+    with open(os.path.join(path, "report", "fray.log"), "w") as f:
+        for line in lines:
+            f.write(trial_log_line(line, first_iter, start_ms) + "\n")
+        if iterations >= 0:
+            f.write(f"Run finished. Total iter: {iterations}\n")
+
+
+class LogTail:
+    # Complete lines appended to a log that may not exist yet.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = None
+        self.pending = ""
+
+    def read_lines(self, final: bool) -> List[str]:
+        if self.file is None:
+            if not os.path.exists(self.path):
+                return []
+            self.file = open(self.path)
+        self.pending += self.file.read()
+        lines = self.pending.split("\n")
+        self.pending = lines.pop()
+        if final and self.pending:
+            lines.append(self.pending)
+            self.pending = ""
+        return lines
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class FrayTrials:
+    # Runs `trials` independent trials of a test in as few Fray processes as
+    # possible. Fray explores with fresh random choices every iteration, so
+    # the iterations up to each bug form one trial and the next iteration
+    # starts a new one. A process is stopped once all trials are done or the
+    # current trial has used up its timeout; remaining trials continue in a
+    # new process. The executors start and wait for the processes.
+    def __init__(self, command: Union[List[str], Dict[str, Any]], log_path: str, timeout: int, trials: int) -> None:
+        self.command = command_args(command)
+        self.env = command_env(command)
+        self.log_path = log_path
+        self.timeout = timeout
+        self.trials = trials
+        self.dirs = trial_dirs(log_path, trials)
+        for path in self.dirs:
+            os.makedirs(path, exist_ok=True)
+            write_command(path, command)
+            if path != log_path and os.path.exists(os.path.join(log_path, "config.json")):
+                remove_file(os.path.join(path, "config.json"))
+                shutil.copyfile(os.path.join(log_path, "config.json"), os.path.join(path, "config.json"))
+        self.start_time = time.time()
+        self.done = 0
+        self.process = 0
+        self.peak_rss = 0
+        self.user_time = 0.0
+        self.sys_time = 0.0
+        self.returncode = 0
 
-def run_stats_collector(command: Dict[str, Any], log_path: str, cwd: str, timeout: int):
-    print(f"Running {log_path}")
+    def start_process(self) -> Tuple[List[str], str]:
+        # The command of the next process and the log it writes.
+        report_dir = os.path.join(self.log_path, "trials", f"process-{self.process}")
+        self.process += 1
+        command = set_option(self.command, "-o", report_dir)
+        command = set_option(command, "--timeout", str(self.timeout * (self.trials - self.done)))
+        command = set_option(command, "--explore")
+        self.consumed_iter = 0
+        self.trial_start_ms = 0
+        # Log lines go to the trial in slice_trial, which started at
+        # slice_start (iteration, ms). A trial that found its bug keeps the
+        # lines up to the next "Starting iteration" or bug report.
+        self.slice_trial = self.done
+        self.slice_start = (0, 0)
+        self.slice_lines: List[str] = []
+        self.trial_iterations: Dict[int, int] = {}
+        self.trial_start = time.time()
+        self.total_iter = -1
+        self.stop_time = None
+        self.reason = "exited"
+        # (directory, elapsed seconds, termination) of the trials this
+        # process finished; their result.json needs its resource usage.
+        self.finished = []
+        return command, os.path.join(report_dir, "fray.log")
+
+    def feed(self, lines: List[str]):
+        for line in lines:
+            if self.slice_trial < self.done < self.trials and (FRAY_STARTING_PATTERN.search(line) or
+                                                               FRAY_ERROR_PATTERN.search(line)):
+                write_trial_log(self.dirs[self.slice_trial], self.slice_lines, *self.slice_start,
+                                self.trial_iterations[self.slice_trial])
+                self.slice_trial, self.slice_start, self.slice_lines = \
+                    self.done, (self.consumed_iter, self.trial_start_ms), []
+            match = FRAY_TOTAL_PATTERN.search(line)
+            if match:
+                # Every trial's log gets its own total.
+                self.total_iter = int(match.group(1))
+                continue
+            self.slice_lines.append(line)
+            match = FRAY_ERROR_PATTERN.search(line)
+            if match is None or self.done == self.trials:
+                continue
+            bug_iter, elapsed_ms = int(match.group(1)), int(match.group(2))
+            write_trial(self.dirs[self.done], True, elapsed_ms - self.trial_start_ms, "exited")
+            self.trial_iterations[self.done] = bug_iter - self.consumed_iter + 1
+            self.finished.append((self.dirs[self.done], (elapsed_ms - self.trial_start_ms) / 1000, "exited"))
+            self.done += 1
+            self.consumed_iter = bug_iter + 1
+            self.trial_start_ms = elapsed_ms
+            self.trial_start = time.time()
+
+    def stop_signal(self, now: float) -> Optional[signal.Signals]:
+        # The signal to send to the running process, if any.
+        if self.stop_time is None and (self.done == self.trials or now - self.trial_start > self.timeout):
+            if self.done < self.trials:
+                self.reason = "timeout:SIGINT"
+            self.stop_time = now
+            return signal.SIGINT
+        if self.stop_time is not None and now - self.stop_time > TERMINATION_GRACE:
+            return signal.SIGKILL
+        return None
+
+    def finish_process(self, result: ProcessResult):
+        self.peak_rss = max(self.peak_rss, result.peak_rss)
+        self.user_time += result.user_time
+        self.sys_time += result.sys_time
+        self.returncode = result.returncode
+        if self.done < self.trials:
+            # The current trial ended without a bug: by timeout, or because
+            # Fray stopped on its own.
+            self.trial_iterations[self.done] = self.total_iter - self.consumed_iter if self.total_iter >= 0 else -1
+            elapsed_ms = int(min(time.time() - self.trial_start, self.timeout) * 1000)
+            write_trial(self.dirs[self.done], False, elapsed_ms, self.reason)
+            self.finished.append((self.dirs[self.done], elapsed_ms / 1000, self.reason))
+            self.done += 1
+        write_trial_log(self.dirs[self.slice_trial], self.slice_lines, *self.slice_start,
+                        self.trial_iterations[self.slice_trial])
+        # Trials that did not log a line of their own.
+        for trial in range(self.slice_trial + 1, self.done):
+            write_trial_log(self.dirs[trial], [], 0, 0, self.trial_iterations[trial])
+        # CPU time and peak RSS are only known for the whole process, so its
+        # trials share them.
+        for path, elapsed, termination in self.finished:
+            write_result(path, "fray", replace(result, elapsed=elapsed, reason=termination,
+                                               timed_out=termination != "exited"))
+
+    def result(self) -> ProcessResult:
+        return ProcessResult(self.returncode, time.time() - self.start_time, self.peak_rss, "exited",
+                             self.user_time, self.sys_time)
+
+
+def run_fray_trials(command: Union[List[str], Dict[str, Any]], log_path: str, cwd: str, timeout: int, trials: int) -> ProcessResult:
+    state = FrayTrials(command, log_path, timeout, trials)
+    while state.done < trials:
+        process_command, log_file = state.start_process()
+        start_time = time.time()
+        proc = subprocess.Popen(process_command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                env=state.env, start_new_session=True)
+        ACTIVE_GROUPS.add(proc.pid)
+        tail = LogTail(log_file)
+        try:
+            while True:
+                pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+                exited = pid != 0
+                state.feed(tail.read_lines(exited))
+                if exited:
+                    break
+                sig = state.stop_signal(time.time())
+                if sig is not None:
+                    kill_process_group(proc.pid, sig)
+                time.sleep(TRIAL_POLL_INTERVAL)
+        except BaseException:
+            kill_process_group(proc.pid)
+            raise
+        finally:
+            tail.close()
+            kill_process_group(proc.pid)
+            ACTIVE_GROUPS.discard(proc.pid)
+        state.finish_process(ProcessResult(os.waitstatus_to_exitcode(status), time.time() - start_time,
+                                           rusage.ru_maxrss, state.reason, rusage.ru_utime, rusage.ru_stime,
+                                           state.stop_time is not None))
+    return state.result()
+
+
+def stats_spec(command: List[str], log_path: str, cwd: str, timeout: int) -> ProcessSpec:
     with open(os.path.join(log_path, "command.txt"), "w") as f:
         f.write(" ".join(command))
-    subprocess.run(command, cwd=cwd, stdout=open(os.path.join(
-        log_path, "stdout.txt"), "w"), stderr=open(os.path.join(log_path, "stderr.txt"), "w"))
+    return ProcessSpec(command, cwd, timeout + RUNNER_TIMEOUT_SLACK,
+                       os.path.join(log_path, "stdout.txt"), os.path.join(log_path, "stderr.txt"))
 
 
-def run_jpf(command: List[str], log_path: str, cwd: str, timeout: int):
-    print(f"Running {log_path}")
+def jpf_spec(command: Dict[str, Any], log_path: str, cwd: str, timeout: int) -> ProcessSpec:
     with open(os.path.join(log_path, "command.json"), "w") as f:
         json.dump(command, f)
-    try:
-        stdout_path = os.path.join(log_path, "stdout.txt")
-        start_time = time.time()
-        subprocess.run(command["command"], cwd=cwd, stdout=open(stdout_path, "w"), stderr=open(
-            os.path.join(log_path, "stderr.txt"), "w"))
-    except subprocess.TimeoutExpired:
-        pass
+    return ProcessSpec(command["command"], cwd, timeout + RUNNER_TIMEOUT_SLACK,
+                       os.path.join(log_path, "stdout.txt"), os.path.join(log_path, "stderr.txt"),
+                       command_env(command))
+
+
+def write_jpf_report(log_path: str, result: ProcessResult):
     with open(os.path.join(log_path, "report.txt"), "w") as report:
-        end_time = time.time()
-        with open(stdout_path, "r") as f:
+        with open(os.path.join(log_path, "stdout.txt"), "r") as f:
             data = f.read()
             if "==== error 1" in data:
                 if "UnsupportedOperationException" in data or \
                     "NoSuchMethodException" in data or "FileNotFoundException" in data or\
                         "Null charset name" in data or "NoSuchMethodError" in data:
-                    report.write(f"Run failed: {end_time - start_time}\n")
+                    report.write(f"Run failed: {result.elapsed}\n")
                 else:
-                    report.write(f"Error Found: {end_time - start_time}\n")
+                    report.write(f"Error Found: {result.elapsed}\n")
             else:
-                report.write(f"No Error: {end_time - start_time}\n")
+                report.write(f"No Error: {result.elapsed}\n")
+        write_termination(report, result)
 
 
-def run_rr(command: List[str], log_path: str, cwd: str, timeout: int):
-    print(f"Running {log_path}")
-    trace_dir = os.path.join(log_path, "trace")
+def rr_spec(command: List[str], log_path: str, cwd: str, timeout: int) -> ProcessSpec:
     with open(os.path.join(log_path, "command.txt"), "w") as f:
         f.write(" ".join(command))
-    with open(os.path.join(log_path, "report.txt"), "w") as stdout:
-        start_time = time.time()
-        error_found = False
-        origin_env = os.environ.copy()
-        try:
-            proc = subprocess.run(command, cwd=cwd, stdout=open(os.path.join(
-                log_path, "stdout.txt"), "w"), stderr=open(os.path.join(log_path, "stderr.txt"), "w"), env={"RR_TIMEOUT": str(timeout), **origin_env})
-            error_found = proc.returncode != 0 and proc.returncode != 124
-        except subprocess.TimeoutExpired:
-            pass
-        if error_found:
-            stdout.write(f"Error Found: {time.time() - start_time}\n")
-        else:
-            stdout.write(f"No Error: {time.time() - start_time}\n")
+    return ProcessSpec(command, cwd, timeout + RUNNER_TIMEOUT_SLACK,
+                       os.path.join(log_path, "stdout.txt"), os.path.join(log_path, "stderr.txt"),
+                       {"RR_TIMEOUT": str(timeout), **os.environ})
 
 
 def load_test_cases(file_path: str) -> List[str]:
@@ -94,6 +444,25 @@ def load_test_cases(file_path: str) -> List[str]:
         return list(filter(str.__len__, map(str.strip, f.readlines())))
 
 
+# Listings of `*` classpath directories keyed by the directory and its
+# mtime, so that dependency folders are scanned once unless they change.
+_LISTING_CACHE: Dict[Tuple[str, float], List[str]] = {}
+_CLASSPATH_CACHE: Dict[Tuple, str] = {}
+_ARGFILE_CACHE: Dict[str, str] = {}
+
+
+def list_classpath_dir(dir_path: str) -> Optional[List[str]]:
+    try:
+        key = (dir_path, os.stat(dir_path).st_mtime)
+    except FileNotFoundError:
+        return None
+    if key not in _LISTING_CACHE:
+        if not os.path.isdir(dir_path):
+            return None
+        _LISTING_CACHE[key] = os.listdir(dir_path)
+    return _LISTING_CACHE[key]
+
+
 def resolve_classpaths(classpaths: List[str]) -> List[str]:
     resolved_paths = []
     for path in classpaths:
@@ -102,8 +471,9 @@ def resolve_classpaths(classpaths: List[str]) -> List[str]:
             pattern = os.path.basename(path).replace('*', '.*')
             regex = re.compile(pattern)
 
-            if os.path.exists(dir_path) and os.path.isdir(dir_path):
-                for entry in os.listdir(dir_path):
+            entries = list_classpath_dir(dir_path)
+            if entries is not None:
+                for entry in entries:
                     if regex.match(entry):
                         resolved_paths.append(os.path.join(dir_path, entry))
         else:
@@ -112,3 +482,105 @@ def resolve_classpaths(classpaths: List[str]) -> List[str]:
                 new_path += '/'
             resolved_paths.append(new_path)
     return resolved_paths
+
+
+def join_classpath(classpaths: List[str]) -> str:
+    # Every test of a benchmark shares the same classpath list.
+    key = (tuple(classpaths), tuple(
+        os.path.getmtime(os.path.dirname(path)) if os.path.isdir(os.path.dirname(path)) else None
+        for path in classpaths if '*' in path
+    ))
+    if key not in _CLASSPATH_CACHE:
+        _CLASSPATH_CACHE[key] = ":".join(resolve_classpaths(classpaths))
+    return _CLASSPATH_CACHE[key]
+
+
+def quote_argfile_arg(arg: str) -> str:
+    if not arg or any(c.isspace() or c in "\"'#" for c in arg):
+        return '"' + arg.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return arg
+
+
+def write_argfile(args: List[str]) -> str:
+    # JVM @argfiles are named after their content, so identical argument
+    # lists share one file and a file never changes once written.
+    content = "\n".join(map(quote_argfile_arg, args)) + "\n"
+    if content not in _ARGFILE_CACHE:
+        digest = hashlib.sha256(content.encode()).hexdigest()[:16]
+        path = os.path.join(ARGFILE_PATH, f"{digest}.args")
+        if not os.path.exists(path):
+            os.makedirs(ARGFILE_PATH, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        _ARGFILE_CACHE[content] = path
+    return "@" + _ARGFILE_CACHE[content]
+
+
+def classpath_argfile(classpaths: List[str]) -> str:
+    return write_argfile(["-cp", join_classpath(classpaths)])
+
+
+Runner = Tuple[Callable[..., ProcessSpec], Optional[Callable[[str, ProcessResult], None]]]
+# (spec, report) of every tool.
+RUNNERS: Dict[str, Runner] = {
+    "java": (fray_spec, write_exit_report),
+    "fray": (fray_spec, write_exit_report),
+    "rr": (rr_spec, write_exit_report),
+    "jpf": (jpf_spec, write_jpf_report),
+    "stat": (stats_spec, None),
+}
+
+
+def pin_command(command: Union[List[str], Dict[str, Any]], cpus: List[int]) -> Union[List[str], Dict[str, Any]]:
+    if not cpus:
+        return command
+    prefix = ["taskset", "-c", format_cpulist(cpus)]
+    if isinstance(command, dict):
+        return {**command, "command": prefix + command["command"]}
+    return prefix + command
+
+
+def remove_file(path: str):
+    if os.path.lexists(path):
+        os.remove(path)
+
+
+def prepare_job(job: Job):
+    os.makedirs(job.log_path, exist_ok=True)
+    config_path = os.path.join(job.log_path, "config.json")
+    if job.config_file is not None or job.config is not None:
+        # config.json may be a hard link to a test plan entry of an earlier
+        # run; writing through it would change the plan for every run.
+        remove_file(config_path)
+    if job.config_file is not None:
+        try:
+            os.link(job.config_file, config_path)
+        except OSError:
+            shutil.copyfile(job.config_file, config_path)
+    elif job.config is not None:
+        with open(config_path, "w") as f:
+            f.write(job.config)
+
+
+def finish_job(job: Job, result: ProcessResult) -> Job:
+    job.peak_rss = result.peak_rss
+    job.returncode = result.returncode
+    return job
+
+
+def finish_run(job: Job, report: Optional[Callable[[str, ProcessResult], None]], result: ProcessResult) -> Job:
+    if report is not None:
+        report(job.log_path, result)
+    write_result(job.log_path, job.tool, result)
+    return finish_job(job, result)
+
+
+def run_job(job: Job) -> Job:
+    prepare_job(job)
+    command = pin_command(job.command, job.cpus)
+    if job.trials > 1:
+        return finish_job(job, run_fray_trials(command, job.log_path, job.cwd, job.timeout, job.trials))
+    spec, report = RUNNERS[job.tool]
+    return finish_run(job, report, run_spec(spec(command, job.log_path, job.cwd, job.timeout)))
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import click
-from .bench_result import BenchResult
+from .bench_result import BenchmarkSuite
 
 @click.group()
 @click.argument("path", type=str)
@@ -10,10 +10,10 @@ from .bench_result import BenchResult
 def main(ctx, path: str):
     ctx.obj = path
 
-@main.command('to_csv')
+@main.command('ingest')
 @click.pass_obj
-def to_csv(path: str):
-    BenchResult(path).to_csv()
+def ingest(path: str):
+    BenchmarkSuite([path]).ingest()
 
 
 
@@ -1,7 +1,7 @@
 import os
 import re
-import shutil
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 import matplotlib.axis
 import numpy as np
 from .bug_classfiers.lucene import lucene_bug_classify
@@ -16,6 +16,8 @@ import pandas as pd
 import seaborn as sns
 import json
 from . import sns_config
+from ..log_scanner import RESULT_NAME, LogView, scan_result, tool_log
+from .results_store import STORE_NAME, has_partition, load_results, write_partition
 
 TOOL_NAME = "Fray"
 
@@ -23,6 +25,12 @@ TOOL_RANDOM = TOOL_NAME + "-Random"
 TOOL_PCT = TOOL_NAME + "-PCT"
 TOOL_POS = TOOL_NAME + "-POS"
 
+# Per-trial record of the runs written to the results store.
+INGEST_INDEX = "ingest.json"
+INGEST_VERSION = 3
+# Columns of the aggregated frame besides Technique.
+SUMMARY_COLUMNS = ["id", "trial", "error", "type", "bug_time", "bug_iter", "total_time", "total_iter"]
+
 
 class BenchResult:
     def __init__(self, path: str, has_trial: bool):
@@ -32,26 +40,17 @@ class BenchResult:
             self.trial = components[-1]
             self.tech = components[-2]
             self.benchmark = components[-3]
+            experiment_dir = os.path.dirname(os.path.dirname(os.path.dirname(self.path)))
         else:
             self.trial = "iter-1"
             self.tech = components[-1]
             self.benchmark = components[-2]
-        self.fray_error_pattern = re.compile(
-            r"Error found at iter: (\d+).+Elapsed time: (\d+)"
-        )
-        self.fray_total_iter_pattern = re.compile(
-            r"Run finished. Total iter: (\d+)"
-        )
-        self.jpf_time_pattern = re.compile(
-            r"ms time:\s+(\d+)"
-        )
-        self.jpf_iter_pattern = re.compile(
-            r",end=(\d+)"
-        )
-
+            experiment_dir = os.path.dirname(os.path.dirname(self.path))
+        self.experiment = os.path.basename(experiment_dir)
+        self.store = os.path.join(os.path.dirname(experiment_dir), STORE_NAME)
         self.user_time_pattern = re.compile(r"real (\d+\.\d+)")
 
-    def bug_classify(self, run_folder: str, stdout: str):
+    def bug_classify(self, run_folder: str, stdout: LogView):
         if self.benchmark == "lucene":
             return lucene_bug_classify(stdout)
         if self.benchmark == "kafka":
@@ -117,95 +116,115 @@ class BenchResult:
         return timed_op_summary, wait_time, caller_list
 
 
-    def to_csv(self):
-        result_folder = os.path.join(self.path, "results")
-        if os.path.exists(result_folder):
-            shutil.rmtree(result_folder)
-        os.makedirs(result_folder)
-        summary_file = open(os.path.join(result_folder, "summary.csv"), "w")
+    def run_inputs(self, run_folder: str) -> List[str]:
+        return [os.path.join(run_folder, RESULT_NAME), tool_log(run_folder, self.tech),
+                os.path.join(run_folder, "time.txt")]
+
+    def input_state(self, run_folder: str) -> List[list]:
+        # (file, size, mtime) of everything parse_run reads; a run is only
+        # parsed again when this changes.
+        state = []
+        for path in self.run_inputs(run_folder):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                state.append([os.path.relpath(path, run_folder), stat.st_size, stat.st_mtime_ns])
+        return state
+
+    def read_result(self, run_folder: str) -> Dict[str, Any]:
+        # The runner's result.json; runs recorded before it existed fall
+        # back to scanning the log.
+        result_path = os.path.join(run_folder, RESULT_NAME)
+        if os.path.exists(result_path):
+            with open(result_path) as f:
+                return json.load(f)
+        return scan_result(tool_log(run_folder, self.tech), self.tech)
+
+    def parse_run(self, folder: str) -> list:
+        run_folder = os.path.join(self.path, folder)
+        result = self.read_result(run_folder)
+        total_iteration, first_bug_iter, first_bug_time = [
+            -1 if result[key] is None else result[key] for key in ["iterations", "first_bug_iter", "first_bug_time"]]
+        bug_type = "N/A"
+        if result["run_failed"]:
+            error_result = "Failure"
+        elif first_bug_iter == -1:
+            error_result = "NoError"
+        else:
+            error_result = "Error"
+        if result["bug_reported"]:
+            with LogView(tool_log(run_folder, self.tech)) as log:
+                bug_type = self.bug_classify(run_folder, log)
+            error_result = "Error"
+        exec_time = self.read_time(run_folder)
+        if self.tech == "java" and exec_time < 600:
+            error_result = "Error"
+            first_bug_time = int(exec_time * 1000)
+        if bug_type == "N/A":
+            # Unclassified runs have no type.
+            bug_type = None
+        # In RESULT_SCHEMA order.
+        return [f"{self.benchmark}-{folder}", error_result, bug_type, first_bug_time, first_bug_iter, exec_time, total_iteration]
+
+    def partition(self) -> Tuple[str, str, str, str]:
+        return self.experiment, self.benchmark, self.tech, self.trial
+
+    def plan_ingest(self) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+        # Incremental: results/ingest.json keeps the input state and result
+        # row of every run folder, so only new or changed runs are parsed.
+        # Returns the run folders in order, with a row of None for the runs
+        # that have to be parsed, and whether the trial's rows change.
+        index_path = os.path.join(self.path, "results", INGEST_INDEX)
+        index = {}
+        if os.path.exists(index_path) and has_partition(self.store, self.partition()):
+            with open(index_path) as f:
+                saved = json.load(f)
+            if saved.get("version") == INGEST_VERSION:
+                index = saved["runs"]
+        runs = {}
+        changed = False
         for folder in sorted(os.listdir(self.path)):
             if folder == "results":
                 continue
-            run_folder = os.path.join(self.path, folder)
-            if self.tech == "rr" or self.tech == "jpf":
-                stdout = open(os.path.join(
-                    run_folder, "stdout.txt")).read()
-            else:
-                stdout = open(os.path.join(run_folder, "report", "fray.log")).read()
-            total_iteration = -1
-            first_bug_iter = -1
-            first_bug_time = -1
-            jpf_error = False
-            if self.tech != "jpf":
-                stdout = stdout.split("\n")
-                for line in reversed(stdout):
-                    if line.startswith("Starting iteration"):
-                        total_iteration = int(line.split(" ")[-1].strip()) + 1
-                        break
-                    match = self.fray_total_iter_pattern.search(line)
-                    if match:
-                        total_iteration = int(match.groups()[0])
-                        break
-                for line in stdout:
-                    match = self.fray_error_pattern.search(line)
-                    if match:
-                        first_bug_iter, first_bug_time = [int(x) for x in match.groups()]
-                        if self.tech != "rr":
-                            first_bug_iter += 1
-                        break
-            elif self.tech == "jpf":
-                if "UnsupportedOperationException" in stdout or \
-                    "NoSuchMethodException" in stdout or "FileNotFoundException" in stdout or\
-                        "Null charset name" in stdout or "NoSuchMethodError" in stdout or\
-                            "JPF out of memory" in stdout or\
-                                "java.lang.NullPointerException: Calling 'startsWith(Ljava/lang/String;)Z' on null object" in stdout:
-                        jpf_error = True
-                stdout = stdout.split("\n")
-                for line in reversed(stdout):
-                    line = line.strip()
-                    if line.startswith("paths ="):
-                        total_iteration = int(line.split("=")[-1].strip())
-                        break
-                for line in stdout:
-                    time_match = self.jpf_time_pattern.search(line)
-                    if time_match:
-                        first_bug_time = time_match.group(1)
-                    iter_match = self.jpf_iter_pattern.search(line)
-                    if iter_match:
-                        first_bug_iter = int(iter_match.group(1)) + 1
-                        break
-            bug_type = "N/A"
-            if jpf_error:
-                error_result = "Failure"
-            elif first_bug_iter == -1:
-                error_result = "NoError"
-            else:
-                error_result = "Error"
-            stdout = "\n".join(stdout)
-            if "Error found" in stdout:
-                bug_type = self.bug_classify(run_folder, stdout)
-                error_result = "Error"
-            exec_time = self.read_time(run_folder)
-            if self.tech == "java" and exec_time < 600:
-                error_result = "Error"
-                first_bug_time = int(exec_time * 1000)
-            summary_file.write(
-                f"{self.benchmark}-{folder},{self.trial},{error_result},{bug_type},{first_bug_time},{first_bug_iter},{exec_time},{total_iteration}\n")
-
-    def load_csv(self) -> pd.DataFrame:
+            state = self.input_state(os.path.join(self.path, folder))
+            entry = index.get(folder)
+            if entry is None or entry["state"] != state:
+                entry = {"state": state, "row": None}
+                changed = True
+            runs[folder] = entry
+        return runs, changed or runs.keys() != index.keys()
+
+    def write_ingest(self, runs: Dict[str, Dict[str, Any]]):
+        # The trial's rows go to its partition of the results store.
+        write_partition(self.store, self.partition(), [entry["row"] for entry in runs.values()])
         result_folder = os.path.join(self.path, "results")
-        if not os.path.exists(result_folder):
-            print(f"Folder {result_folder} not found")
-            raise Exception("No results folder found")
-        df = pd.read_csv(
-            os.path.join(result_folder, "summary.csv"), names=["id", "trial", "error", "type", "bug_time", "bug_iter", "total_time", "total_iter"]
-        )
-        return df
+        os.makedirs(result_folder, exist_ok=True)
+        index_path = os.path.join(result_folder, INGEST_INDEX)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INGEST_VERSION, "runs": runs}, f)
+        os.replace(tmp_path, index_path)
+
+    def ingest(self) -> bool:
+        runs, changed = self.plan_ingest()
+        for folder, entry in runs.items():
+            if entry["row"] is None:
+                entry["row"] = self.parse_run(folder)
+        if changed:
+            self.write_ingest(runs)
+        return changed
+
+
+def parse_run_task(task: Tuple[BenchResult, str]) -> list:
+    bench, folder = task
+    return bench.parse_run(folder)
 
 
 class BenchmarkSuite:
     def __init__(self, paths: List[str]):
         self.benchmarks: List[BenchResult] = []
+        # Aggregated frames of all trials by the columns read, dropped when a
+        # trial's results change.
+        self.frames: Dict[Optional[Tuple[str, ...]], pd.DataFrame] = {}
         for path in paths:
             self.path = os.path.abspath(path)
             for tech in os.listdir(self.path):
@@ -242,15 +261,50 @@ class BenchmarkSuite:
             axis.set_title(f"{bench.benchmark}")
             axis.set_xlabel("Timeout (ms)")
 
-    def to_aggregated_dataframe(self) -> pd.DataFrame:
-        data = []
-        for bench in self.benchmarks:
-            bench.to_csv()
-            df = bench.load_csv()
-            df["Technique"] = self.name_remap(bench.tech)
-            data.append(df)
-        df = pd.concat(data, ignore_index=True)
-        return df
+    def ingest(self, workers: Optional[int] = None) -> bool:
+        # Runs that have to be parsed are spread over a process pool across
+        # all benchmarks and trials. pool.map returns the rows in task order,
+        # so every trial gets the same rows whichever worker finishes first.
+        plans = [bench.plan_ingest() for bench in self.benchmarks]
+        tasks = []
+        entries = []
+        for bench, (runs, _) in zip(self.benchmarks, plans):
+            for folder, entry in runs.items():
+                if entry["row"] is None:
+                    tasks.append((bench, folder))
+                    entries.append(entry)
+        workers = workers or os.cpu_count() or 1
+        if len(tasks) > 1 and workers > 1:
+            with ProcessPoolExecutor(workers) as pool:
+                rows = list(pool.map(parse_run_task, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+        else:
+            rows = [parse_run_task(task) for task in tasks]
+        for entry, row in zip(entries, rows):
+            entry["row"] = row
+        changed = False
+        for bench, (runs, bench_changed) in zip(self.benchmarks, plans):
+            if bench_changed:
+                bench.write_ingest(runs)
+                changed = True
+        return changed
+
+    def to_aggregated_dataframe(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        # Reads the given SUMMARY_COLUMNS (all by default) of this suite's
+        # partitions from the results store.
+        if self.ingest():
+            self.frames.clear()
+        key = tuple(columns) if columns is not None else None
+        if key not in self.frames:
+            partitions: Dict[str, List[Tuple[str, str, str, str]]] = {}
+            for bench in self.benchmarks:
+                partitions.setdefault(bench.store, []).append(bench.partition())
+            read_columns = list(columns if columns is not None else SUMMARY_COLUMNS) + ["technique"]
+            data = [load_results(store, read_columns, store_partitions) for store, store_partitions in partitions.items()]
+            df = pd.concat(data, ignore_index=True)
+            df["Technique"] = df.pop("technique").map(self.name_remap)
+            self.frames[key] = df
+        # The generate_* methods add columns to the frame they get.
+        return self.frames[key].copy()
 
     def name_remap(self, name: str) -> str:
         if name == "random":
@@ -268,7 +322,7 @@ class BenchmarkSuite:
         return name.upper()
 
     def generate_bug_table(self):
-        df = self.to_aggregated_dataframe()
+        df = self.to_aggregated_dataframe(["id", "error", "type"])
         df = df.replace(r'^TP\(Time\)', 'Time', regex=True)
         df = df.replace(r'^TP\(.+', 'TP', regex=True)
         df = df.replace(r'^FP\(Time\)', 'Time (FP)', regex=True)
@@ -288,7 +342,7 @@ class BenchmarkSuite:
         return result[["Technique", "Test Run", "Failure", "Time (FP)"]]
 
     def generate_search_space_table(self) -> matplotlib.axis.Axis:
-        df = self.to_aggregated_dataframe()
+        df = self.to_aggregated_dataframe(["id", "error", "bug_iter"])
         df = df[df["error"] == "Error"]
         return self.generate_aggregated_plot(df, "bug_iter")
 
@@ -365,7 +419,7 @@ class BenchmarkSuite:
         pass
 
     def generate_exec_speed_table(self) -> matplotlib.axis.Axis:
-        df = self.to_aggregated_dataframe()
+        df = self.to_aggregated_dataframe(["id", "trial", "error", "total_time", "total_iter"])
         df = df[df["error"] != "Failure"]
         df["exec"] = df["total_iter"] / df["total_time"]
         df = df.sort_values(by="exec")
@@ -377,7 +431,7 @@ class BenchmarkSuite:
         return self.generate_aggregated_plot(df, "exec")
 
     def generate_exec_speed_table_prime(self) -> matplotlib.axis.Axis:
-        df = self.to_aggregated_dataframe()
+        df = self.to_aggregated_dataframe(["id", "error", "total_time", "total_iter"])
         df = df[df["error"] != "Failure"]
         df["exec"] = df["total_iter"] / df["total_time"]
         df = df.sort_values(by="id")
@@ -410,7 +464,7 @@ class BenchmarkSuite:
         print(f"Geometric mean of slowdown: {slowdown_geomean:.2f}%")
 
     def generate_bug_over_time_fig(self, measurement: str) -> matplotlib.axes.Axes:
-        df = self.to_aggregated_dataframe()
+        df = self.to_aggregated_dataframe(["id", "trial", "error", "bug_time"])
         total_bugs =df["id"].nunique()
         df = df[df["error"] == "Error"]
         df_grouped = df
@@ -461,7 +515,7 @@ class BenchmarkSuite:
         if exclude_all_zero and exclude_some_zero:
             raise ValueError("Cannot exclude both all zero and some zero")
 
-        df = self.to_aggregated_dataframe()
+        df = self.to_aggregated_dataframe(["id", "error", "bug_iter"])
 
         # Mean bug_iter only for found bugs
         found_df = (
@@ -547,7 +601,7 @@ class BenchmarkSuite:
         return ax
 
     def generate_bug_found_iterations_fig(self) -> matplotlib.axes.Axes:
-        df = self.to_aggregated_dataframe()
+        df = self.to_aggregated_dataframe(["id", "error", "bug_iter"])
         df = df[df["error"] == "Error"]
 
         # Find bugs found by all techniques
@@ -570,7 +624,7 @@ class BenchmarkSuite:
         return ax
 
     def generate_bug_over_iterations_fig(self, measurement: str) -> matplotlib.axes.Axes:
-        df = self.to_aggregated_dataframe()
+        df = self.to_aggregated_dataframe(["id", "trial", "error", "bug_iter"])
         total_bugs = df["id"].nunique()
         df = df[df["error"] == "Error"]
         df_grouped = df
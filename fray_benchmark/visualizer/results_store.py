@@ -0,0 +1,64 @@
+import os
+from typing import Iterable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# One Parquet dataset for all experiments, next to the experiment folders
+# (output/results.parquet), partitioned as
+# experiment=<name>/benchmark=<app>/technique=<tech>/trial=<iter-n>/.
+STORE_NAME = "results.parquet"
+PARTITION_COLUMNS = ["experiment", "benchmark", "technique", "trial"]
+RESULT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("error", pa.string()),
+    ("type", pa.string()),
+    ("bug_time", pa.int64()),
+    ("bug_iter", pa.int64()),
+    ("total_time", pa.float64()),
+    ("total_iter", pa.int64()),
+])
+PARTITIONING = ds.partitioning(
+    pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS]), flavor="hive")
+PART_NAME = "part-0.parquet"
+
+
+def partition_dir(store: str, partition: Tuple[str, str, str, str]) -> str:
+    return os.path.join(store, *(f"{column}={value}" for column, value in zip(PARTITION_COLUMNS, partition)))
+
+
+def write_partition(store: str, partition: Tuple[str, str, str, str], rows: List[list]):
+    # Rows are in RESULT_SCHEMA order; a trial's partition is replaced as a
+    # whole when it is ingested again.
+    path = partition_dir(store, partition)
+    os.makedirs(path, exist_ok=True)
+    columns = list(zip(*rows)) if rows else [[] for _ in RESULT_SCHEMA]
+    table = pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, RESULT_SCHEMA)], schema=RESULT_SCHEMA)
+    tmp_path = os.path.join(path, f".{PART_NAME}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, os.path.join(path, PART_NAME))
+
+
+def has_partition(store: str, partition: Tuple[str, str, str, str]) -> bool:
+    return os.path.exists(os.path.join(partition_dir(store, partition), PART_NAME))
+
+
+def load_results(store: str, columns: Optional[List[str]] = None,
+                 partitions: Optional[Iterable[Tuple[str, ...]]] = None) -> pd.DataFrame:
+    # Reads only the requested columns. `partitions` are prefixes of
+    # (experiment, benchmark, technique, trial); folders that match none of
+    # them are not opened.
+    dataset = ds.dataset(store, format="parquet", schema=pa.unify_schemas([RESULT_SCHEMA, PARTITIONING.schema]),
+                         partitioning=PARTITIONING)
+    expression = None
+    for partition in partitions or []:
+        match = None
+        for column, value in zip(PARTITION_COLUMNS, partition):
+            term = ds.field(column) == value
+            match = term if match is None else match & term
+        if match is not None:
+            expression = match if expression is None else expression | match
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
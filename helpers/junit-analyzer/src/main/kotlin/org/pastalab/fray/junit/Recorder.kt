@@ -1,8 +1,11 @@
 package org.pastalab.fray.junit
 
 import org.pastalab.fray.runtime.Runtime
+import java.io.BufferedWriter
 import java.io.File
 import java.lang.instrument.Instrumentation
+import java.util.concurrent.ConcurrentHashMap
+import java.util.concurrent.atomic.AtomicInteger
 import junit.framework.TestCase
 import org.junit.jupiter.engine.descriptor.TestMethodTestDescriptor
 import org.junit.platform.engine.TestDescriptor
@@ -10,76 +13,106 @@ import org.junit.platform.engine.TestExecutionResult
 import org.junit.platform.engine.support.descriptor.ClassSource
 import org.junit.vintage.engine.descriptor.VintageTestDescriptor
 
+// Writes one JSON line per finished test to the file passed as the agent
+// argument: {"test": "Class#method", "status": ..., "threads": ..., "duration": ms}.
 object Recorder {
-  var newThreadSpawned = false
-  val f = File("/tmp/junit.log")
-  val f2 = File("/tmp/failed.log")
+  const val DEFAULT_OUTPUT = "junit-tests.jsonl"
+  val threadsSpawned = AtomicInteger(0)
+  val startTimes = ConcurrentHashMap<String, Long>()
+  lateinit var output: BufferedWriter
 
   fun logThread() {
-    newThreadSpawned = true
+    threadsSpawned.incrementAndGet()
   }
 
   @JvmStatic
   fun testStart(testCase: TestCase) {
-    newThreadSpawned = false
+    threadsSpawned.set(0)
+    startTimes[testCase.javaClass.name + "#" + testCase.name] = System.nanoTime()
   }
 
   @JvmStatic
   fun executionStarted(descriptor: TestDescriptor) {
-    newThreadSpawned = false
+    threadsSpawned.set(0)
+    startTimes[descriptor.uniqueId.toString()] = System.nanoTime()
   }
 
-  @JvmStatic
-  fun executionFinished(descriptor: TestDescriptor, result: TestExecutionResult) {
-    if (newThreadSpawned && result.status == TestExecutionResult.Status.SUCCESSFUL) {
-      if (descriptor is VintageTestDescriptor) {
-        val methodName = descriptor.displayName
-        if (descriptor.parent.isPresent) {
-          val parent = descriptor.parent.get()
-          if (parent.source.isPresent) {
-            val source = parent.source.get()
-            if (source is ClassSource) {
-              source.className
-              f.appendText("${source.className}#${methodName}\n")
-            }
-          }
+  fun testName(descriptor: TestDescriptor): String? {
+    if (descriptor is VintageTestDescriptor && descriptor.parent.isPresent) {
+      val parent = descriptor.parent.get()
+      if (parent.source.isPresent) {
+        val source = parent.source.get()
+        if (source is ClassSource) {
+          return "${source.className}#${descriptor.displayName}"
         }
       }
-      if (descriptor is TestMethodTestDescriptor) {
-        f.appendText("${descriptor.testClass.name}#${descriptor.testMethod.name}\n")
-      }
     }
-    if (result.status != TestExecutionResult.Status.SUCCESSFUL) {
-      if (descriptor is TestMethodTestDescriptor) {
-        f2.appendText("${descriptor.testClass.name}#${descriptor.testMethod.name}\n")
-      }
+    if (descriptor is TestMethodTestDescriptor) {
+      return "${descriptor.testClass.name}#${descriptor.testMethod.name}"
+    }
+    return null
+  }
+
+  @JvmStatic
+  fun executionFinished(descriptor: TestDescriptor, result: TestExecutionResult) {
+    val start = startTimes.remove(descriptor.uniqueId.toString())
+    val name = testName(descriptor)
+    if (name != null && start != null) {
+      record(name, result.status.name, start)
     }
-    newThreadSpawned = false
+    threadsSpawned.set(0)
   }
 
   @JvmStatic
   fun execution(descriptor: TestDescriptor) {
-    newThreadSpawned = false
+    threadsSpawned.set(0)
   }
 
   @JvmStatic
   fun testEnd(testCase: TestCase) {
-    if (newThreadSpawned) {
-      f.appendText("${testCase.javaClass.name}#${testCase.name}\n")
+    val name = testCase.javaClass.name + "#" + testCase.name
+    val start = startTimes.remove(name)
+    if (start != null) {
+      record(name, "FINISHED", start)
     }
-    newThreadSpawned = false
+    threadsSpawned.set(0)
+  }
+
+  fun jsonString(value: String): String {
+    val builder = StringBuilder("\"")
+    for (c in value) {
+      when {
+        c == '"' || c == '\\' -> builder.append('\\').append(c)
+        c < ' ' -> builder.append(String.format("\\u%04x", c.code))
+        else -> builder.append(c)
+      }
+    }
+    return builder.append('"').toString()
+  }
+
+  @Synchronized
+  fun record(name: String, status: String, start: Long) {
+    val duration = (System.nanoTime() - start) / 1_000_000
+    output.write(
+        "{\"test\": ${jsonString(name)}, \"status\": \"$status\", " +
+            "\"threads\": ${threadsSpawned.get()}, \"duration\": $duration}\n")
+  }
+
+  @Synchronized
+  fun close() {
+    output.close()
   }
 
-  fun init() {
-    f.delete()
-    f.createNewFile()
-    f2.delete()
-    f2.createNewFile()
+  fun init(path: String) {
+    val file = File(path)
+    file.absoluteFile.parentFile?.mkdirs()
+    output = file.bufferedWriter(bufferSize = 1 shl 16)
+    java.lang.Runtime.getRuntime().addShutdownHook(Thread { close() })
   }
 }
 
 fun premain(arguments: String?, instrumentation: Instrumentation) {
-  Recorder.init()
+  Recorder.init(if (arguments.isNullOrEmpty()) Recorder.DEFAULT_OUTPUT else arguments)
   Runtime.DELEGATE = JunitRuntimeDelegate()
   instrumentation.addTransformer(JunitRunnerTransformer())
 }
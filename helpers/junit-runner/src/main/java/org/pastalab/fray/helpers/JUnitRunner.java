@@ -1,8 +1,16 @@
 package org.pastalab.fray.helpers;
 
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.PrintStream;
 import java.io.PrintWriter;
 import java.io.StringWriter;
 import java.lang.reflect.Method;
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.Properties;
 
 import org.junit.platform.engine.discovery.DiscoverySelectors;
 import org.junit.platform.launcher.Launcher;
@@ -42,14 +50,9 @@ public class JUnitRunner {
     }
 
 
-    public static void main(String[] args) throws ClassNotFoundException {
-        boolean isJunit4 = args[0].equals("junit4");
-        String[] classAndMethod = args[1].split("#");
-        boolean systemExit = false;
-        if (args.length > 2) {
-            systemExit = Boolean.parseBoolean(args[2]);
-        }
-
+    // Returns the failure report of the test or null if it passed.
+    static String runTest(boolean isJunit4, String selector) throws ClassNotFoundException {
+        String[] classAndMethod = selector.split("#");
         if (isJunit4) {
             Request request = Request.method(
                     Class.forName(classAndMethod[0], true, Thread.currentThread().getContextClassLoader()),
@@ -64,12 +67,7 @@ public class JUnitRunner {
                             .append("trace: ").append(failure.getTrace()).append("\n")
                             .append("description: ").append(failure.getDescription()).append("\n");
                 }
-                System.out.println(failureReport.toString());
-                if (systemExit) {
-                    System.exit(1);
-                } else {
-                    throw new RuntimeException(failureReport.toString());
-                }
+                return failureReport.toString();
             }
         } else {
             Class[] parameterTypes = new Class[0];
@@ -103,16 +101,105 @@ public class JUnitRunner {
                             .append("trace: ").append(stringWriter.toString()).append("\n")
                             .append("exception: ").append(failure.getException()).append("\n");
                 });
-                System.out.println(failureReport.toString());
-                if (systemExit) {
-                    System.exit(1);
-                } else {
-                    throw new RuntimeException(failureReport.toString());
-                }
+                return failureReport.toString();
+            }
+        }
+        return null;
+    }
+
+    static String jsonString(String value) {
+        StringBuilder builder = new StringBuilder("\"");
+        for (char c : value.toCharArray()) {
+            switch (c) {
+                case '"': builder.append("\\\""); break;
+                case '\\': builder.append("\\\\"); break;
+                case '\n': builder.append("\\n"); break;
+                case '\r': builder.append("\\r"); break;
+                case '\t': builder.append("\\t"); break;
+                default:
+                    if (c < 0x20) {
+                        builder.append(String.format("\\u%04x", (int) c));
+                    } else {
+                        builder.append(c);
+                    }
+            }
+        }
+        return builder.append('"').toString();
+    }
+
+    // Runs every selector of the batch file (one `class#method` per line) in
+    // this JVM. A failing test does not stop the batch; each test gets a
+    // JSON record in the file named by -Dfray.junit.results, or on stdout.
+    // Fray calls main once per iteration, so the file is truncated on every
+    // call and holds the records of the last iteration only.
+    static void runBatch(boolean isJunit4, String batchPath, boolean systemExit) throws IOException {
+        List<String> selectors = new ArrayList<>();
+        for (String line : Files.readAllLines(Paths.get(batchPath))) {
+            if (!line.trim().isEmpty()) {
+                selectors.add(line.trim());
+            }
+        }
+        String resultsPath = System.getProperty("fray.junit.results");
+        PrintStream results = resultsPath == null ? System.out : new PrintStream(new FileOutputStream(resultsPath, false), true);
+        StringBuilder failureReport = new StringBuilder();
+        for (String selector : selectors) {
+            // Isolate tests from each other's property changes and
+            // leftover interrupts.
+            Properties properties = (Properties) System.getProperties().clone();
+            long start = System.nanoTime();
+            String status;
+            String failure;
+            try {
+                failure = runTest(isJunit4, selector);
+                status = failure == null ? "passed" : "failed";
+            } catch (Throwable e) {
+                StringWriter stringWriter = new StringWriter();
+                e.printStackTrace(new PrintWriter(stringWriter));
+                failure = stringWriter.toString();
+                status = "error";
+            }
+            Thread.interrupted();
+            System.setProperties(properties);
+            long durationMs = (System.nanoTime() - start) / 1_000_000;
+            results.println((resultsPath == null ? "JUnitRunner result: " : "")
+                    + "{\"test\": " + jsonString(selector)
+                    + ", \"status\": " + jsonString(status)
+                    + ", \"duration_ms\": " + durationMs
+                    + ", \"failure\": " + (failure == null ? "null" : jsonString(failure)) + "}");
+            if (failure != null) {
+                failureReport.append("test: ").append(selector).append("\n").append(failure);
+            }
+        }
+        if (results != System.out) {
+            results.close();
+        }
+        finish(failureReport.length() > 0 ? failureReport.toString() : null, systemExit);
+    }
+
+    static void finish(String failureReport, boolean systemExit) {
+        if (failureReport != null) {
+            System.out.println(failureReport);
+            if (systemExit) {
+                System.exit(1);
+            } else {
+                throw new RuntimeException(failureReport);
             }
         }
         if (systemExit) {
             System.exit(0);
         }
     }
+
+    public static void main(String[] args) throws ClassNotFoundException, IOException {
+        boolean isJunit4 = args[0].equals("junit4");
+        if (args[1].equals("--batch")) {
+            runBatch(isJunit4, args[2], args.length > 3 && Boolean.parseBoolean(args[3]));
+            return;
+        }
+        boolean systemExit = false;
+        if (args.length > 2) {
+            systemExit = Boolean.parseBoolean(args[2]);
+        }
+        finish(runTest(isJunit4, args[1]), systemExit);
+    }
 }
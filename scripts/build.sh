@@ -27,9 +27,4 @@ export JAVA_HOME=$JDK21_HOME
 
 cd $BASEDIR
 
-python3 -m fray_benchmark build sctbench
-python3 -m fray_benchmark build jacontebe
-python3 -m fray_benchmark build lucene
-python3 -m fray_benchmark build kafka
-python3 -m fray_benchmark build guava
-python3 -m fray_benchmark build lincheck 
+python3 -m fray_benchmark build --all 
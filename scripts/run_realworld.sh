@@ -35,30 +35,9 @@ else
     echo "Running limited evaluation with fray scheduler pos only using $CPU_COUNT CPU cores..."
 fi
 
-# Always run fray with scheduler pos (basic evaluation)
-python3 -m fray_benchmark run fray kafka --name realworld --scheduler pos --iterations 1 --cpu $CPU_COUNT
-python3 -m fray_benchmark run fray lucene --name realworld --scheduler pos --iterations 1 --cpu $CPU_COUNT
-python3 -m fray_benchmark run fray guava --name realworld --scheduler pos --iterations 1 --cpu $CPU_COUNT
-python3 -m fray_benchmark run fray lincheck --name realworld --scheduler pos --iterations 1 --cpu $CPU_COUNT
-
-# Only run additional commands if full-evaluation is enabled
+CAMPAIGN=scripts/campaigns/realworld.json
 if [ "$FULL_EVALUATION" = true ]; then
-    python3 -m fray_benchmark run rr kafka --name realworld --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run rr lucene --name realworld --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run rr guava --name realworld --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray kafka --name realworld --scheduler pct3 --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray lucene --name realworld --scheduler pct3 --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray guava --name realworld --scheduler pct3 --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray kafka --name realworld --scheduler pct15 --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray lucene --name realworld --scheduler pct15 --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray guava --name realworld --scheduler pct15 --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray kafka --name realworld --scheduler surw --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray lucene --name realworld --scheduler surw --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray guava --name realworld --scheduler surw --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray kafka --name realworld --scheduler random --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray lucene --name realworld --scheduler random --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run fray guava --name realworld --scheduler random --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run jpf kafka --name realworld --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run jpf lucene --name realworld --iterations 1 --cpu $CPU_COUNT
-    python3 -m fray_benchmark run jpf guava --name realworld --iterations 1 --cpu $CPU_COUNT
+    CAMPAIGN=scripts/campaigns/realworld.full.json
 fi
+
+python3 -m fray_benchmark campaign $CAMPAIGN --cpu $CPU_COUNT